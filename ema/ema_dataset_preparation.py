@@ -13,7 +13,8 @@ import time
 import pyedflib
 from scipy.signal import find_peaks_cwt, welch
 from scipy.signal import decimate
-from mne.filter import filter_data
+from mne.filter import filter_data, create_filter
+from functools import lru_cache
 from datetime import timedelta, datetime
 from typing import Dict, List
 from argparse import ArgumentParser
@@ -295,6 +296,12 @@ class TremorFeatureExtractor(FeatureExtractor):
         return features
 
 
+@lru_cache(maxsize=None)
+def _iir_filter_params(sample_rate, l_freq, h_freq):
+    # the IIR design of filter_data, computed once per sampling rate and band instead of for every window
+    return create_filter(None, sample_rate, l_freq, h_freq, method='iir', verbose='WARNING')
+
+
 class BradykinesiaFeatureExtractor(FeatureExtractor):
     def __init__(self):
         self.accelerometer_channels = [('AccX', 0), ('AccY', 1), ('AccZ', 2)]
@@ -315,12 +322,15 @@ class BradykinesiaFeatureExtractor(FeatureExtractor):
         
     def get_features(self, window_data, sample_rate, window_length=60):
         features = []
-        windowData = filter_data(window_data[:, [ch[1] for ch in self.accelerometer_channels]].T, sr, 0, 3,
-                                 method='iir', verbose='WARNING').T
-        freq = np.fft.rfftfreq(window_length * sr, d=1. / sr)
+        # the filter is designed and applied in float64, whatever the precision of the trial data
+        # filter_data may update the parameters it is given, so it gets a copy of the cached design
+        windowData = filter_data(window_data[:, [ch[1] for ch in self.accelerometer_channels]].T.astype(np.float64),
+                                 sample_rate, 0, 3, method='iir',
+                                 iir_params=dict(_iir_filter_params(sample_rate, 0, 3)), verbose='WARNING').T
+        freq = np.fft.rfftfreq(window_length * sample_rate, d=1. / sample_rate)
         
         for ch_key, ch_val in self.accelerometer_channels:
-            f, spec = welch(windowData[:, ch_val], fs=sr, nperseg=sr)
+            f, spec = welch(windowData[:, ch_val], fs=sample_rate, nperseg=sample_rate)
             selected = np.logical_and(f > 0.5, f < 3.0)
             spec = np.mean(np.log(spec[selected]))
             features.append(spec)
@@ -426,7 +436,11 @@ if __name__ == "__main__":
     
     parser.add_argument('--raw-data-path', metavar='path', type=str, default="/media/alex/05A408EF2467286E/EMA_PD")
     parser.add_argument('--config-level', metavar="config_level", type=int, default=0)
+    parser.add_argument('--precision', metavar="precision", type=str, default="float64",
+                        choices=["float32", "float64"])
     args = parser.parse_args()
+    # float32 trial data halves the memory and disk used by the trials, the features table stays float64
+    data_type = np.float32 if args.precision == "float32" else np.float64
 
     path = args.raw_data_path
     ema_data_file = os.path.join(path, "EMA_data.csv")
@@ -461,8 +475,8 @@ if __name__ == "__main__":
             
             
             np.savez_compressed(os.path.join(pre_processed_data_path, subject + '_trials_compressed.npz'),
-                                trial_data=trial_data,
-                                beep_trial_data=beep_trial_data,
+                                trial_data=trial_data.astype(data_type),
+                                beep_trial_data=beep_trial_data.astype(data_type),
                                 trial_data_ts=np.array([t.to_numpy() for t in kept_window_ts]))
             selected_esm.to_csv(os.path.join(pre_processed_data_path, subject + '_esm.csv'), index=False)
             
@@ -481,8 +495,8 @@ if __name__ == "__main__":
         for subject in all_subjects:
             print("Extracting wearable features for subject: ", subject, " ... ")
             subject_data = np.load(os.path.join(pre_processed_data_path, subject + '_trials_compressed.npz'))
-            trial_data = subject_data["trial_data"].astype(np.float64)
-            beep_trial_data = subject_data["beep_trial_data"].astype(np.float64)
+            trial_data = subject_data["trial_data"].astype(data_type, copy=False)
+            beep_trial_data = subject_data["beep_trial_data"].astype(data_type, copy=False)
             trial_data_ts = subject_data["trial_data_ts"]
             
             selected_esm = pd.read_csv(os.path.join(pre_processed_data_path, subject + '_esm.csv'))
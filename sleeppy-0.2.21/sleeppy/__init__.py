@@ -1,2 +1,21 @@
-from sleeppy.sleep import SleepPy, ColeKripke, band_pass_filter, bin2df, activity_index
+from sleeppy.sleep import (
+    SleepPy,
+    ColeKripke,
+    band_pass_filter,
+    bin2df,
+    activity_index,
+    activity_index_windows,
+    read_major_rest_periods,
+)
+from sleeppy.scoring import (
+    webster_rescore,
+    cole_kripke_nights,
+    cole_kripke_sweep,
+    OnlineColeKripke,
+)
+from sleeppy.endpoints import recording_nights, night_endpoints
+from sleeppy.filters import band_pass_design, zero_phase_filter
+from sleeppy.store import open_store
+from sleeppy.cohort import run_cohort
+from sleeppy.reports import render_reports
 from sleeppy.version import __version__
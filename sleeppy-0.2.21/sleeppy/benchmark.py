@@ -0,0 +1,362 @@
+import os
+import sys
+import json
+import platform
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import scipy
+from sleeppy.sleep import SleepPy, ColeKripke
+from sleeppy.geneactiv import read_bin
+from sleeppy.instrument import measure
+from sleeppy.synthetic import synthetic_recording, write_bin, write_csv
+from sleeppy.version import __version__
+
+__all__ = [
+    "make_recording",
+    "benchmark_recording",
+    "run_benchmarks",
+    "load_results",
+    "save_results",
+    "compare",
+]
+
+# benchmark names of the stages measured by SleepPy(instrument=True)
+STAGES = {
+    "split": "split_days",
+    "activity_index": "extract_activity_index",
+    "wear": "wear_detection",
+    "major_rest_period": "major_rest_period",
+    "sleep_wake": "sleep_wake_predict",
+    "endpoints": "calculate_endpoints",
+    "reports": "visualize_results",
+    "run": "total",
+}
+METRICS = {
+    # metric: smallest absolute change reported as a regression, to ignore noise on short stages
+    "wall_time_s": 0.05,
+    "peak_rss_mb": 10.0,
+}
+
+
+class _BenchmarkSleepPy(SleepPy):
+    """
+    SleepPy skipping the visual reports, which are not part of the benchmark unless requested.
+    """
+
+    def __init__(self, *args, reports=False, **kwargs):
+        """
+        Class initialization.
+
+        :param reports: boolean flag to generate the visual reports
+        """
+        self.reports = reports
+        super().__init__(*args, **kwargs)
+
+    def visualize_results(self):
+        if self.reports:
+            super().visualize_results()
+        else:
+            try:
+                os.mkdir(self.sub_dst + "/reports")  # expected by aggregate_results
+            except OSError:
+                pass
+
+
+def make_recording(work_directory, days, sampling_frequency, file_format, seed=0):
+    """
+    Generates a synthetic GeneActiv recording for the benchmark, unless it was already generated.
+
+    :param work_directory: directory where the recordings are saved
+    :param days: length of the recording in days
+    :param sampling_frequency: sampling frequency in Hz
+    :param file_format: "bin" or "csv"
+    :param seed: seed of the random number generator
+    :return: path of the recording
+    """
+    path = work_directory + "/synthetic_{}d_{}hz_{}.{}".format(
+        days, sampling_frequency, seed, file_format
+    )
+    if not os.path.exists(path):
+        chunks = synthetic_recording(days, sampling_frequency, seed=seed)
+        tmp = path[:-4] + "_tmp." + file_format
+        if file_format == "bin":
+            write_bin(tmp, chunks, sampling_frequency)
+        elif file_format == "csv":
+            write_csv(tmp, chunks)
+        else:
+            raise ValueError("unknown file format '{}'".format(file_format))
+        os.replace(tmp, path)
+    return path
+
+
+def _best(records):
+    """
+    Keeps the fastest of repeated measurements of a stage.
+    """
+    best = {}
+    for record in records:
+        if record["stage"] not in best or (
+            record["wall_time_s"] < best[record["stage"]]["wall_time_s"]
+        ):
+            best[record["stage"]] = record
+    return list(best.values())
+
+
+def benchmark_recording(
+    path, sampling_frequency, results_directory, repeats=1, reports=False, **kwargs
+):
+    """
+    Times the stages of SleepPy on a recording, as well as the .bin decoder and the Cole-Kripke scorer on their own.
+
+    :param path: path of the recording
+    :param sampling_frequency: sampling frequency of the recording
+    :param results_directory: directory where the SleepPy results are saved
+    :param repeats: number of times every stage is run, the fastest run is kept
+    :param reports: boolean flag to include the visual reports
+    :param kwargs: further arguments passed on to SleepPy
+    :return: list of measurement records
+    """
+    # load (or compile) the rescoring kernel once, so that it is not part of the first measurement
+    ColeKripke(pd.Series(np.zeros(60))).predict()
+
+    records = []
+    for _ in range(repeats):
+        if path.endswith(".bin"):
+            with measure("bin2df") as record:
+                record["rows"] = len(read_bin(path))
+            records.append(record)
+
+        stages = []
+        sleeppy = _BenchmarkSleepPy(
+            path,
+            results_directory,
+            sampling_frequency,
+            reports=reports,
+            instrument_callback=stages.append,
+            **kwargs
+        )
+        for record in stages:
+            if record["stage"] == "reports" and not reports:
+                continue
+            if record["day"] is None and record["stage"] in STAGES:
+                record["stage"] = STAGES[record["stage"]]
+                records.append(record)
+
+        # the scorer on the activity index of every day, without the input and output of the stage
+        activity = [
+            sleeppy.store.read("activity_index", day).activity_index
+            for day in sleeppy.store.days("activity_index")
+        ]
+        with measure("ColeKripke") as record:
+            for ai in activity:
+                ColeKripke(ai).predict()
+                record["rows"] += len(ai)
+        records.append(record)
+    return _best(records)
+
+
+def _environment():
+    """
+    Describes the machine and the versions the benchmark ran with.
+    """
+    try:
+        import numba
+
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {
+        "sleeppy": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "numba": numba_version,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmarks(
+    work_directory,
+    days=(1, 7, 14),
+    sampling_frequency=25,
+    formats=("bin", "csv"),
+    repeats=1,
+    storage="memory",
+    verbose=False,
+    **kwargs
+):
+    """
+    Runs the benchmark on synthetic recordings of every length and format. Every recording is benchmarked in a fresh
+    process, so that its peak memory is its own.
+
+    :param work_directory: directory where the recordings and the SleepPy results are saved
+    :param days: lengths of the recordings in days
+    :param sampling_frequency: sampling frequency of the recordings
+    :param formats: formats of the recordings, "bin" and/or "csv"
+    :param repeats: number of times every stage is run, the fastest run is kept
+    :param storage: SleepPy backend for the intermediate data (default "memory", to leave out the disk)
+    :param verbose: boolean for printing status
+    :param kwargs: further arguments passed on to SleepPy
+    :return: dictionary housing the environment, the parameters and the measurement records
+    """
+    results_directory = work_directory + "/results"
+    for directory in (work_directory, results_directory):
+        try:
+            os.mkdir(directory)  # set up output directory
+        except OSError:
+            pass
+    results = {
+        "environment": _environment(),
+        "parameters": dict(
+            sampling_frequency=sampling_frequency,
+            repeats=repeats,
+            storage=storage,
+            **kwargs
+        ),
+        "results": [],
+    }
+    for file_format in formats:
+        for length in days:
+            if verbose:
+                print("Generating {} day .{} recording...".format(length, file_format))
+            path = make_recording(work_directory, length, sampling_frequency, file_format)
+            if verbose:
+                print("Benchmarking {}...".format(path))
+            with ProcessPoolExecutor(1) as pool:
+                records = pool.submit(
+                    benchmark_recording,
+                    path,
+                    sampling_frequency,
+                    results_directory,
+                    repeats,
+                    storage=storage,
+                    **kwargs
+                ).result()
+            for record in records:
+                del record["day"], record["pid"]
+                record.update(format=file_format, days=length, sampling_frequency=sampling_frequency)
+                results["results"].append(record)
+                if verbose:
+                    print(
+                        "  {:<24}{:>10.3f} s{:>10.1f} MB".format(
+                            record["stage"], record["wall_time_s"], record["peak_rss_mb"] or 0
+                        )
+                    )
+    return results
+
+
+def save_results(results, path):
+    """
+    Saves benchmark results as json, to be used as a baseline.
+
+    :param results: dictionary returned by run_benchmarks
+    :param path: path of the json file
+    """
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    """
+    Loads benchmark results saved with save_results.
+
+    :param path: path of the json file
+    :return: dictionary of results
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compares benchmark results against a baseline. A measurement regresses if it grew by more than the tolerance and
+    by more than a minimum absolute amount (see METRICS).
+
+    :param results: dictionary returned by run_benchmarks
+    :param baseline: dictionary of baseline results
+    :param tolerance: allowed relative increase
+    :return: list of dictionaries describing every regression
+    """
+
+    def key(record):
+        return (
+            record["format"],
+            record["days"],
+            record["sampling_frequency"],
+            record["stage"],
+        )
+
+    reference = {key(record): record for record in baseline["results"]}
+    regressions = []
+    for record in results["results"]:
+        before = reference.get(key(record))
+        if before is None:
+            continue
+        for metric, minimum in METRICS.items():
+            if before[metric] is None or record[metric] is None:
+                continue
+            if (
+                record[metric] > before[metric] * (1 + tolerance)
+                and record[metric] - before[metric] > minimum
+            ):
+                regressions.append(
+                    dict(
+                        zip(("format", "days", "sampling_frequency", "stage"), key(record)),
+                        metric=metric,
+                        baseline=before[metric],
+                        current=record[metric],
+                    )
+                )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="""Benchmark the stages of SleepPy on synthetic
+                GENEActiv recordings.""", add_help=True
+    )
+
+    parser.add_argument('--workDirectory', metavar='work_directory', type=str, required=True)
+    parser.add_argument('--days', metavar='days', type=float, nargs='+', default=[1, 7, 14])
+    parser.add_argument('--samplingFrequency', metavar='sampling_frequency', type=int, default=25)
+    parser.add_argument('--formats', metavar='formats', type=str, nargs='+', default=["bin", "csv"])
+    parser.add_argument('--repeats', metavar='repeats', type=int, default=1)
+    parser.add_argument('--storage', metavar='storage', type=str, default="memory")
+    parser.add_argument('--workers', metavar='workers', type=int, default=1)
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--reports', action='store_true')
+    parser.add_argument('--output', metavar='output', type=str, default=None)
+    parser.add_argument('--baseline', metavar='baseline', type=str, default=None)
+    parser.add_argument('--tolerance', metavar='tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.workDirectory,
+        days=[int(d) if d == int(d) else d for d in args.days],
+        sampling_frequency=args.samplingFrequency,
+        formats=args.formats,
+        repeats=args.repeats,
+        storage=args.storage,
+        verbose=True,
+        workers=args.workers,
+        streaming=args.streaming,
+        reports=args.reports,
+    )
+    output = args.output or args.workDirectory + "/benchmark_results.json"
+    save_results(results, output)
+    print("Results saved to {}".format(output))
+
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        for r in regressions:
+            print(
+                "Regression: {format} {days} days {stage} {metric}: {baseline:.3f} -> {current:.3f}".format(**r)
+            )
+        if regressions:
+            sys.exit(1)
+        print("No regressions against {}".format(args.baseline))
@@ -0,0 +1,111 @@
+import os
+import json
+import hashlib
+from sleeppy.version import __version__
+
+__all__ = ["fingerprint", "code_version", "stage_key", "StageCache"]
+
+_CODE_VERSION = None
+
+
+def fingerprint(path, content=False):
+    """
+    Identifies the contents of an input file, either by its size and modification time, or by a digest of its bytes.
+
+    :param path: path of the file
+    :param content: boolean flag to digest the contents of the file instead of using its size and modification time
+    :return: fingerprint string
+    """
+    if not content:
+        stat = os.stat(path)
+        return "{}:{}".format(stat.st_size, stat.st_mtime_ns)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_version():
+    """
+    Version of the code producing the cached data: the package version and a digest of its modules, so that changes
+    to the code invalidate the cache even without a version bump.
+
+    :return: version string
+    """
+    global _CODE_VERSION
+    if _CODE_VERSION is None:
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(package)):
+            if name.endswith(".py"):
+                with open(os.path.join(package, name), "rb") as f:
+                    digest.update(name.encode() + b"\0" + f.read())
+        _CODE_VERSION = "{}+{}".format(__version__, digest.hexdigest()[:12])
+    return _CODE_VERSION
+
+
+def stage_key(*parts):
+    """
+    Hashes the inputs of a stage (upstream stage keys, parameters, ...) into a key.
+
+    :param parts: json serializable values, anything else is converted to a string
+    :return: key string
+    """
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class StageCache:
+    """
+    Manifest of the stages whose outputs are up to date, saved as a json file mapping every completed stage to the key
+    of the inputs it was run with.
+    """
+
+    def __init__(self, path):
+        """
+        Initialization of the class
+
+        :param path: path of the manifest file
+        """
+        self.path = path
+        try:
+            with open(path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def is_fresh(self, stage, key):
+        """
+        Checks whether a stage was completed with the given key.
+
+        :param stage: name of the stage
+        :param key: key of the stage inputs
+        :return: boolean
+        """
+        return self.manifest.get(stage) == key
+
+    def invalidate(self, stage):
+        """
+        Marks a stage as not up to date, before it is run.
+
+        :param stage: name of the stage
+        """
+        if self.manifest.pop(stage, None) is not None:
+            self._save()
+
+    def update(self, stage, key):
+        """
+        Marks a stage as completed with the given key.
+
+        :param stage: name of the stage
+        :param key: key of the stage inputs
+        """
+        self.manifest[stage] = key
+        self._save()
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
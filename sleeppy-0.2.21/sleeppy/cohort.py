@@ -0,0 +1,273 @@
+import os
+import glob
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Manager
+import pandas as pd
+from sleeppy.sleep import SleepPy
+from sleeppy.cache import fingerprint, code_version, stage_key
+
+__all__ = ["find_recordings", "run_key", "is_up_to_date", "run_cohort"]
+
+EXTENSIONS = (".bin", ".csv")
+ENDPOINTS_FILE = "/results/sleep_endpoints_summary.csv"
+RUN_KEY_FILE = "/results/cohort_run_key.txt"
+COHORT_ENDPOINTS_FILE = "/cohort_endpoints_summary.csv"
+
+# SleepPy arguments that do not change the results of a recording
+RUN_ONLY_ARGUMENTS = ("workers", "verbose", "instrument", "instrument_callback")
+
+
+class _CohortSleepPy(SleepPy):
+    """
+    SleepPy limiting the number of recordings of a cohort being decoded at the same time, since splitting the raw
+    data into days is when a recording takes up the most memory.
+    """
+
+    def __init__(self, *args, decodes=None, **kwargs):
+        """
+        Class initialization.
+
+        :param decodes: semaphore shared by the cohort workers, or None for no limit
+        """
+        self.decodes = decodes
+        super().__init__(*args, **kwargs)
+
+    def split_days(self):
+        if self.decodes is None:
+            return super().split_days()
+        with self.decodes:
+            return super().split_days()
+
+
+def _is_output(path, results_directory):
+    """
+    Checks whether a file was written by a cohort run: the cohort endpoints summary, or any file in the directory of the
+    results of a recording.
+    """
+    if os.path.basename(path) == COHORT_ENDPOINTS_FILE[1:]:
+        return True
+    if results_directory is None:
+        return False
+    results_directory = os.path.realpath(results_directory)
+    directory = os.path.dirname(os.path.realpath(path))
+    return directory != results_directory and directory.startswith(os.path.join(results_directory, ""))
+
+
+def find_recordings(source, results_directory=None):
+    """
+    Lists the GeneActiv recordings (.bin or .csv) of a cohort, leaving out the files written by a cohort run.
+
+    :param source: directory of recordings, or glob pattern
+    :param results_directory: directory where the results of the cohort are saved, if it may be inside the source
+    :return: sorted list of recording paths
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, i) for i in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(
+        p
+        for p in paths
+        if p.endswith(EXTENSIONS)
+        and os.path.isfile(p)
+        and not _is_output(p, results_directory)
+    )
+
+
+def _endpoints_path(path, results_directory):
+    src_name = path.split("/")[-1][0:-4]  # same naming convention as SleepPy
+    return results_directory + "/" + src_name + ENDPOINTS_FILE
+
+
+def _run_key_path(path, results_directory):
+    src_name = path.split("/")[-1][0:-4]  # same naming convention as SleepPy
+    return results_directory + "/" + src_name + RUN_KEY_FILE
+
+
+def run_key(path, sampling_frequency, kwargs):
+    """
+    Key of a run of SleepPy on a recording: the recording file, the code version, and the arguments that change its
+    results.
+
+    :param path: path of the recording
+    :param sampling_frequency: sampling frequency of the GeneActiv data
+    :param kwargs: further arguments passed on to SleepPy
+    :return: key string
+    """
+    arguments = {k: v for k, v in kwargs.items() if k not in RUN_ONLY_ARGUMENTS}
+    return stage_key(fingerprint(path), code_version(), sampling_frequency, arguments)
+
+
+def is_up_to_date(path, results_directory, key=None):
+    """
+    Checks whether a recording was already processed, i.e. its endpoints summary exists and is newer than the recording,
+    and, if a key is given, it was processed with the same key.
+
+    :param path: path of the recording
+    :param results_directory: directory where the results of the cohort are saved
+    :param key: key of the run (see run_key), or None to only compare modification times
+    :return: boolean
+    """
+    dst = _endpoints_path(path, results_directory)
+    if not (os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(path)):
+        return False
+    if key is None:
+        return True
+    try:
+        with open(_run_key_path(path, results_directory)) as f:
+            return f.read().strip() == key
+    except OSError:
+        return False
+
+
+def _run_recording(path, results_directory, sampling_frequency, decodes, kwargs):
+    """
+    Runs SleepPy on one recording of the cohort.
+
+    :return: tuple of the path of the recording and the error message, None on success
+    """
+    try:
+        key = run_key(path, sampling_frequency, kwargs)
+        _CohortSleepPy(
+            input_file=path,
+            results_directory=results_directory,
+            sampling_frequency=sampling_frequency,
+            decodes=decodes,
+            **kwargs
+        )
+        with open(_run_key_path(path, results_directory), "w") as f:
+            f.write(key)
+    except Exception as e:
+        return path, "{}: {}".format(type(e).__name__, e)
+    return path, None
+
+
+def run_cohort(
+    source,
+    results_directory,
+    sampling_frequency,
+    workers=1,
+    max_decodes=None,
+    force=False,
+    verbose=False,
+    **kwargs
+):
+    """
+    Runs SleepPy on every recording of a cohort, and consolidates the endpoints of all recordings in a single table,
+    saved as cohort_endpoints_summary.csv in the results directory. Recordings that are already up to date, i.e.
+    processed since they last changed and with the same arguments and code, are skipped, and a recording that fails is
+    reported without stopping the others. Files inside the results directory are never taken for recordings.
+
+    :param source: directory of recordings, or glob pattern
+    :param results_directory: full path to the directory where the results should be saved
+    :param sampling_frequency: sampling frequency of the GeneActiv data to be processed
+    :param workers: number of recordings processed at the same time
+    :param max_decodes: maximum number of recordings split into days at the same time (default no limit), to bound
+    the memory used by the workers
+    :param force: boolean flag to process recordings even if they are up to date
+    :param verbose: boolean for printing status
+    :param kwargs: further arguments passed on to SleepPy
+    :return: pandas dataframe of the endpoints of every day of every recording
+    """
+    try:
+        os.mkdir(results_directory)  # set up output directory
+    except OSError:
+        pass
+    recordings = find_recordings(source, results_directory)
+    todo = [
+        p
+        for p in recordings
+        if force
+        or not is_up_to_date(
+            p, results_directory, run_key(p, sampling_frequency, kwargs)
+        )
+    ]
+    if verbose:
+        print(
+            "Processing {} of {} recordings...".format(len(todo), len(recordings))
+        )
+
+    failed = set()
+
+    def report(path, error):
+        if error is not None:
+            failed.add(path)
+            print("Error processing: {}\nError: {}".format(path, error))
+        elif verbose:
+            print("Processed: {}".format(path))
+
+    if workers > 1 and len(todo) > 1:
+        with Manager() as manager:
+            decodes = manager.Semaphore(max_decodes) if max_decodes else None
+            with ProcessPoolExecutor(min(workers, len(todo))) as pool:
+                futures = [
+                    pool.submit(
+                        _run_recording,
+                        path,
+                        results_directory,
+                        sampling_frequency,
+                        decodes,
+                        kwargs,
+                    )
+                    for path in todo
+                ]
+                for future in as_completed(futures):
+                    report(*future.result())
+    else:
+        for path in todo:
+            report(
+                *_run_recording(path, results_directory, sampling_frequency, None, kwargs)
+            )
+
+    # consolidate the endpoints of every processed recording
+    tables = []
+    for path in recordings:
+        dst = _endpoints_path(path, results_directory)
+        if path in failed or not os.path.exists(dst):
+            continue
+        df = pd.read_csv(dst)
+        df.insert(0, "recording", path.split("/")[-1][0:-4])
+        tables.append(df)
+    endpoints = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+    endpoints.to_csv(results_directory + COHORT_ENDPOINTS_FILE, index=False)
+    return endpoints
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="""Extract sleep information from a cohort of
+                GENEACtiv accelerometer bin/csv files using SleepPy.""", add_help=True
+    )
+
+    parser.add_argument('--source', metavar='source', type=str, required=True)
+    parser.add_argument('--resultsDirectory', metavar='results_directory', type=str, required=True)
+    parser.add_argument('--samplingFrequency', metavar='sampling_frequency', type=float, required=True)
+    parser.add_argument('--workers', metavar='workers', type=int, default=1)
+    parser.add_argument('--maxDecodes', metavar='max_decodes', type=int, default=None)
+    parser.add_argument('--storage', metavar='storage', type=str, default="hdf5")
+    parser.add_argument('--force', action='store_true')
+    parser.add_argument('--lazyReports', action='store_true')
+    parser.add_argument('--csvReader', metavar='csv_reader', type=str, default="pandas")
+    parser.add_argument('--precision', metavar='precision', type=str, default="float64")
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--filterForm', metavar='filter_form', type=str, default="ba")
+    parser.add_argument('--filterMode', metavar='filter_mode', type=str, default="window")
+    args = parser.parse_args()
+
+    run_cohort(
+        args.source,
+        args.resultsDirectory,
+        args.samplingFrequency,
+        workers=args.workers,
+        max_decodes=args.maxDecodes,
+        force=args.force,
+        verbose=True,
+        storage=args.storage,
+        lazy_reports=args.lazyReports,
+        csv_reader=args.csvReader,
+        precision=args.precision,
+        incremental=args.incremental,
+        filter_form=args.filterForm,
+        filter_mode=args.filterMode,
+    )
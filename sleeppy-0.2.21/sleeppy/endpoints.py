@@ -0,0 +1,165 @@
+import datetime
+import numpy as np
+import pandas as pd
+import tzlocal
+
+__all__ = ["ENDPOINT_COLUMNS", "recording_nights", "night_endpoints"]
+
+# columns of sleep_endpoints_summary.csv
+ENDPOINT_COLUMNS = [
+    "sleep_onset",
+    "sleep_onset_ts",
+    "rise",
+    "rise_ts",
+    "total_bed_time",
+    "total_sleep_time",
+    "total_wake_time",
+    "sleep_efficiency",
+    "waso",
+    "first_waso",
+    "sleep_onset_latency",
+    "num_active_periods",
+    "median_active_len",
+]
+
+
+def recording_nights(store, major_rest_periods, recording, days=None):
+    """
+    Builds the long format table of the sleep wake predictions of a recording, as taken by night_endpoints. Tables of
+    several recordings can be concatenated to compute the endpoints of a whole cohort at once.
+
+    :param store: DayStore instance of the recording
+    :param major_rest_periods: pandas dataframe of the start and end of the major rest period of every day, indexed by
+    day (see read_major_rest_periods)
+    :param recording: name of the recording
+    :param days: list of day numbers (default every day with predictions)
+    :return: pandas dataframe of recording, day, time, prediction, start and end, one row per epoch
+    """
+    if days is None:
+        days = store.days("sleep_wake")
+    nights = []
+    for day in days:
+        df = store.read("sleep_wake", day)
+        nights.append(
+            pd.DataFrame(
+                {
+                    "recording": recording,
+                    "day": day,
+                    "time": df.index,
+                    # predictions may be stored in a smaller type
+                    "prediction": df.sleep_predictions.values.astype(np.float64),
+                    "start": major_rest_periods["start"].get(day, pd.NaT),
+                    "end": major_rest_periods["end"].get(day, pd.NaT),
+                }
+            )
+        )
+    return pd.concat(nights, ignore_index=True)
+
+
+def _local_time(time, timezone):
+    return time.replace(tzinfo=timezone).astimezone(timezone)
+
+
+def night_endpoints(nights, timezone=None):
+    """
+    Calculates the sleep endpoints of many nights at once. Every night is cut to its major rest period (the whole day
+    if it has none), and the endpoints of all nights are computed together with grouped array operations, giving the
+    numbers SleepPy.calculate_endpoints gave night by night: sleep onset at the first sleep epoch, wake after sleep
+    onset counted from it, first wake after sleep onset at the first wake epoch after it, and the number of wake bouts
+    and their median length from the runs of wake epochs.
+
+    :param nights: pandas dataframe of recording, day, time (of the epoch), prediction (1 for wake, 0 for sleep), and
+    start and end (of the major rest period of the night, NaT if there is none), one row per 1 minute epoch, with the
+    epochs of every night in time order
+    :param timezone: timezone the onset and rise times are localized to (default the local timezone)
+    :return: pandas dataframe of the endpoints of every night (see ENDPOINT_COLUMNS), indexed by recording and day
+    """
+    if timezone is None:
+        timezone = tzlocal.get_localzone()
+
+    # keep the major rest periods, both ends included
+    whole = (nights["start"].isnull() | nights["end"].isnull()).values
+    time = nights["time"].values
+    keep = whole | (
+        (time >= nights["start"].values) & (time <= nights["end"].values)
+    )
+    nights = nights.loc[keep]
+    if nights.empty:
+        return pd.DataFrame(
+            columns=ENDPOINT_COLUMNS,
+            index=pd.MultiIndex.from_arrays([[], []], names=["recording", "day"]),
+        )
+    time = nights["time"].values
+    pred = nights["prediction"].values.astype(np.float64)
+    key = nights.groupby(["recording", "day"], sort=False).ngroup().values
+
+    # boundaries of the nights
+    position = np.arange(len(pred))
+    first = np.r_[True, key[1:] != key[:-1]]
+    starts = np.flatnonzero(first)
+    night = np.cumsum(first) - 1
+    length = np.diff(np.r_[starts, len(pred)])
+    last = starts + length - 1
+
+    def first_where(mask):
+        # position of the first epoch of every night where mask is true (the first epoch if there is none)
+        found = np.full(len(starts), -1)
+        idx = np.flatnonzero(mask)[::-1]
+        found[night[idx]] = idx
+        return np.where(found < 0, starts, found)
+
+    # sleep onset: first epoch with the lowest prediction of the night
+    lowest = np.minimum.reduceat(pred, starts)
+    onset = first_where(pred == lowest[night])
+    after_onset = position >= onset[night]
+
+    # wake after sleep onset, and the first wake epoch after sleep onset
+    wake = np.add.reduceat(pred, starts)
+    waso = np.add.reduceat(np.where(after_onset, pred, 0.0), starts)
+    highest = np.maximum.reduceat(np.where(after_onset, pred, -np.inf), starts)
+    first_wake = first_where(after_onset & (pred == highest[night]))
+
+    # wake bouts: runs of wake epochs, a new run starting wherever a prediction differs from the previous one
+    new_run = first | np.r_[True, pred[1:] != pred[:-1]]
+    run = np.cumsum(new_run) - 1
+    run_length = np.bincount(run)
+    run_start = np.flatnonzero(new_run)
+    wake_run = pred[run_start] > 0
+    bouts = np.bincount(night[run_start[wake_run]], minlength=len(starts))
+    median_bout = (
+        pd.Series(run_length[wake_run])
+        .groupby(night[run_start[wake_run]])
+        .median()
+        .reindex(range(len(starts)))
+    )
+
+    seconds = np.timedelta64(1, "s")
+    total_bed_time = length * 60
+    tst = (length - wake) * 60
+    onset_time = [_local_time(pd.Timestamp(t), timezone) for t in time[onset]]
+    rise_time = [_local_time(pd.Timestamp(t), timezone) for t in time[last]]
+    endpoints = pd.DataFrame(
+        {
+            "sleep_onset": [
+                datetime.datetime.strftime(t, "%Y-%m-%d %H:%M:%S.%z") for t in onset_time
+            ],
+            "sleep_onset_ts": [int(t.timestamp()) for t in onset_time],
+            "rise": [datetime.datetime.strftime(t, "%Y-%m-%d %H:%M:%S.%z") for t in rise_time],
+            "rise_ts": [int(t.timestamp()) for t in rise_time],
+            "total_bed_time": total_bed_time.astype(np.int64),
+            "total_sleep_time": tst.astype(np.int64),
+            "total_wake_time": (total_bed_time - tst).astype(np.int64),
+            "sleep_efficiency": np.round(100.0 * (length - wake) / length.astype(np.float64)).astype(np.int64),
+            "waso": (waso * 60).astype(np.int64),
+            "first_waso": ((time[first_wake] - time[onset]) / seconds).astype(np.int64),
+            "sleep_onset_latency": ((time[onset] - time[starts]) / seconds).astype(np.int64),
+            "num_active_periods": bouts.astype(np.int64),
+            # missing for nights without wake bouts
+            "median_active_len": np.trunc(median_bout * 60).astype("Int64").values,
+        },
+        index=pd.MultiIndex.from_arrays(
+            [nights["recording"].values[starts], nights["day"].values[starts]],
+            names=["recording", "day"],
+        ),
+    )
+    return endpoints[ENDPOINT_COLUMNS]
@@ -0,0 +1,81 @@
+from functools import lru_cache
+import numpy as np
+from scipy import signal
+
+__all__ = ["FILTER_FORMS", "FILTER_MODES", "band_pass_design", "ringing_length", "zero_phase_filter"]
+
+# forms of the filter coefficients: numerator and denominator ("ba", same as the legacy filtfilt) or second-order
+# sections ("sos", numerically stabler for higher orders and narrow bands)
+FILTER_FORMS = ("ba", "sos")
+
+# how the activity index signal is filtered: every window on its own ("window", the legacy behaviour) or the
+# continuous signal, in overlapping chunks ("continuous")
+FILTER_MODES = ("window", "continuous")
+
+
+@lru_cache(maxsize=256)
+def _butter_band_pass(sampling_rate, bp_cutoff, order, form):
+    # Calculate the critical frequency (radians/sample) based on cutoff frequency (Hz) and sampling rate (Hz)
+    critical_frequency = [
+        bp_cutoff[0] * 2.0 / sampling_rate,
+        bp_cutoff[1] * 2.0 / sampling_rate,
+    ]
+    design = signal.butter(
+        N=order, Wn=critical_frequency, btype="bandpass", analog=False, output=form
+    )
+    return (design,) if form == "sos" else tuple(design)
+
+
+def band_pass_design(sampling_rate, bp_cutoff, order, form="ba"):
+    """
+    Butterworth band-pass filter design, memoized on the sampling rate, cutoffs, order and form, so that a design is
+    computed once per process however many windows, days and recordings it filters.
+
+    :param sampling_rate: sampling rate of signal
+    :param bp_cutoff: filter cutoffs
+    :param order: filter order
+    :param form: form of the coefficients, "ba" (numerator and denominator) or "sos" (second-order sections)
+    :return: tuple of coefficient arrays, (b, a) or (sos,), shared by every caller and not to be modified
+    """
+    if form not in FILTER_FORMS:
+        raise ValueError("unknown filter form '{}'".format(form))
+    return _butter_band_pass(
+        float(sampling_rate), tuple(float(c) for c in bp_cutoff), int(order), form
+    )
+
+
+def ringing_length(design, tol=1e-12):
+    """
+    Number of samples the impulse response of a filter takes to decay below a tolerance, from the radius of its
+    slowest pole. Filtering a chunk of signal extended by this many samples on both sides gives the chunk the same
+    values, to within the tolerance, as filtering the whole signal.
+
+    :param design: tuple of coefficient arrays from band_pass_design
+    :param tol: decay of the impulse response relative to its peak
+    :return: number of samples
+    """
+    if len(design) == 1:
+        poles = np.concatenate([np.roots(section[3:]) for section in design[0]])
+    else:
+        poles = np.roots(design[1])
+    radius = np.abs(poles).max() if len(poles) else 0.0
+    if radius <= 0.0:
+        return 1
+    return int(np.ceil(np.log(tol) / np.log(radius)))
+
+
+def zero_phase_filter(design, data, axis=0, padlen=10):
+    """
+    Zero phase (forward and backward) filtering with a design from band_pass_design, by filtfilt for (b, a) and
+    sosfiltfilt for (sos,).
+
+    :param design: tuple of coefficient arrays
+    :param data: array of the signal
+    :param axis: axis of data to filter along
+    :param padlen: number of samples the signal is extended by at both ends (None for the scipy default)
+    :return: array of the filtered signal
+    """
+    if len(design) == 1:
+        return signal.sosfiltfilt(design[0], data, axis=axis, padlen=padlen)
+    b, a = design
+    return signal.filtfilt(b, a, data, axis=axis, padlen=padlen)
@@ -0,0 +1,556 @@
+import mmap
+import numpy as np
+import pandas as pd
+
+__all__ = [
+    "parse_bin_header",
+    "decode_pages",
+    "BinReader",
+    "read_bin",
+    "csv_time_range",
+    "csv_offset",
+    "iter_csv",
+    "parse_csv_times",
+    "iter_csv_arrow",
+]
+
+PAGE_SAMPLES = 300  # number of samples stored in a single data page
+PAGE_HEX_LENGTH = 3600  # 300 samples * 12 hex characters (48 bits) per sample
+HEADER_LINES = 60  # number of lines that make up the file header
+CSV_HEADER_LINES = 100  # number of lines preceding the samples in a GeneActiv .csv export
+CSV_TIME_FORMAT = "%Y-%m-%d %H:%M:%S:%f"
+CSV_COLUMNS = ["Time", "X", "Y", "Z", "LUX", "Button", "T"]
+CSV_TIME_LENGTH = 23  # length of a YYYY-mm-dd HH:MM:SS:fff time stamp
+
+
+def parse_bin_header(lines):
+    """
+    Parses the calibration data and the measurement frequency out of the header of a GeneActiv .bin file.
+
+    :param lines: iterable of header lines (bytes, without line terminators)
+    :return: dictionary housing gains, offsets, volts, lux and sampling frequency
+    """
+    fields = {
+        b"x gain": "x_gain",
+        b"x offset": "x_offset",
+        b"y gain": "y_gain",
+        b"y offset": "y_offset",
+        b"z gain": "z_gain",
+        b"z offset": "z_offset",
+        b"Volts": "volts",
+        b"Lux": "lux",
+    }
+    header = {}
+    for line in lines:
+        for field, name in fields.items():
+            if field in line:
+                header[name] = int(line.split(b":")[-1])
+        if "fs" not in header and b"Measurement Frequency:" in line:
+            header["fs"] = float(line.split(b":")[-1].split(b" ")[0])
+    return header
+
+
+def calibration_tables(header):
+    """
+    Builds lookup tables mapping every possible raw reading to its calibrated value. Accelerometer readings are 12 bit
+    two's complement integers and light readings are 10 bit unsigned integers, so tables of 4096 and 1024 entries cover
+    every value that can be stored in a page, and calibrating a recording becomes a single indexing operation.
+
+    :param header: dictionary returned by parse_bin_header
+    :return: tuple of x, y, z and light lookup tables
+    """
+    raw = range(-2048, 2048)
+    x = np.array([round((v * 100.0 - header["x_offset"]) / header["x_gain"], 4) for v in raw])
+    y = np.array([round((v * 100.0 - header["y_offset"]) / header["y_gain"], 4) for v in raw])
+    z = np.array([round((v * 100.0 - header["z_offset"]) / header["z_gain"], 4) for v in raw])
+    lux = np.array([v * header["lux"] / header["volts"] for v in range(1024)])
+    return x, y, z, lux
+
+
+def unpack_samples(hex_data):
+    """
+    Unpacks hex encoded GeneActiv samples. Each sample is stored as 48 bits: 12 bit x, y and z readings, a 10 bit light
+    reading, a button bit and a reserved bit.
+
+    :param hex_data: bytes housing the concatenated hex characters of one or more data pages
+    :return: tuple of x, y, z (offset by 2048 into the range 0-4095) and light readings as integer arrays
+    """
+    raw = np.frombuffer(bytes.fromhex(hex_data.decode("ascii")), dtype=np.uint8)
+    raw = raw.reshape(-1, 6).astype(np.int32)
+    x = (raw[:, 0] << 4) | (raw[:, 1] >> 4)
+    y = ((raw[:, 1] & 0x0F) << 8) | raw[:, 2]
+    z = (raw[:, 3] << 4) | (raw[:, 4] >> 4)
+    lux = ((raw[:, 4] & 0x0F) << 6) | (raw[:, 5] >> 2)
+
+    # flipping the sign bit of a 12 bit two's complement reading maps -2048..2047 onto 0..4095
+    return x ^ 0x800, y ^ 0x800, z ^ 0x800, lux
+
+
+def sample_offsets(fs):
+    """
+    Time offsets of the samples of a page relative to the page time.
+
+    :param fs: sampling frequency
+    :return: array of timedelta64 offsets
+    """
+    offset = np.array([1 / fs] * PAGE_SAMPLES) * np.arange(0, PAGE_SAMPLES)
+    return pd.to_timedelta(offset, unit="s").values
+
+
+def decode_pages(
+    hex_data,
+    page_times,
+    temperatures,
+    header,
+    float_dtype=np.float64,
+    light_dtype=np.float64,
+):
+    """
+    Decodes a batch of GeneActiv data pages into a single pandas dataframe.
+
+    :param hex_data: bytes housing the concatenated hex characters of the data pages
+    :param page_times: array of page start times (one per page)
+    :param temperatures: array of page temperatures (one per page)
+    :param header: dictionary returned by parse_bin_header
+    :param float_dtype: type of the X, Y, Z and T columns
+    :param light_dtype: type of the LUX column, light values are rounded if it is an integer type
+    :return: pandas dataframe of calibrated X, Y, Z, LUX and T values indexed by time
+    """
+    # lookup tables in the requested types, so that the samples are decoded straight into them
+    x_lut, y_lut, z_lut, lux_lut = calibration_tables(header)
+    x_lut, y_lut, z_lut = [lut.astype(float_dtype) for lut in (x_lut, y_lut, z_lut)]
+    if np.issubdtype(light_dtype, np.integer):
+        lux_lut = np.round(lux_lut)
+    lux_lut = lux_lut.astype(light_dtype)
+    x, y, z, lux = unpack_samples(hex_data)
+
+    # time stamp every sample from the start time of its page
+    delta = sample_offsets(header["fs"])
+    times = np.repeat(np.asarray(page_times, dtype="datetime64[ns]"), PAGE_SAMPLES)
+    times += np.tile(delta, len(page_times))
+
+    df = pd.DataFrame(
+        {
+            "X": x_lut[x],
+            "Y": y_lut[y],
+            "Z": z_lut[z],
+            "LUX": lux_lut[lux],
+            "T": np.repeat(np.asarray(temperatures, dtype=float_dtype), PAGE_SAMPLES),
+        },
+        index=pd.DatetimeIndex(times, name="Time"),
+    )
+    return df
+
+
+class BinReader:
+    """
+    Random access reader for GeneActiv .bin files. The file is memory mapped and indexed by page, so that only the
+    pages overlapping a requested time range are ever decoded.
+    """
+
+    def __init__(self, full_path, float_dtype=np.float64, light_dtype=np.float64):
+        """
+        Class initialization, maps the file and builds the page index.
+
+        :param full_path: full path to geneactiv .bin file
+        :param float_dtype: type of the decoded X, Y, Z and T columns
+        :param light_dtype: type of the decoded LUX column
+        """
+        self.full_path = full_path
+        self.float_dtype = float_dtype
+        self.light_dtype = light_dtype
+        self._file = open(full_path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty files cannot be mapped
+            self._file.close()
+            raise ValueError("No data pages found in {}".format(full_path))
+        first_page = self._map.find(b"Page Time:")
+        if first_page < 0:
+            self.close()
+            raise ValueError("No data pages found in {}".format(full_path))
+        self.header = parse_bin_header(
+            self._map[:first_page].split(b"\r\n")[:HEADER_LINES]
+        )
+        self.fs = self.header["fs"]
+        self.last_offset = sample_offsets(self.fs)[-1]  # offset of the last sample of a page
+        self.data_offset = first_page  # byte offset of the first page time, where the recorded data starts
+        self._build_index(first_page)
+
+    def _build_index(self, pos):
+        """
+        Walks the page headers, recording the byte offset of the hex data, the page time and the temperature of every
+        page. The hex data itself is skipped over and never read.
+
+        :param pos: byte offset of the first page
+        """
+        mm = self._map
+        offsets, times, temps = [], [], []
+        while pos >= 0:
+            # locate the page time, the temperature and the line preceding the hex data
+            pos_time = mm.find(b"Page Time:", pos)
+            end_time = mm.find(b"\r\n", pos_time)
+            pos_temp = mm.find(b"Temperature:", end_time)
+            end_temp = mm.find(b"\r\n", pos_temp)
+            pos = mm.find(b"Measurement Frequency:", end_temp)
+            start = mm.find(b"\r\n", pos) + 2
+            if min(pos_time, end_time, pos_temp, end_temp, pos) < 0:
+                break
+            if start + PAGE_HEX_LENGTH > len(mm):
+                break  # truncated page at the end of the file
+            if mm[start + PAGE_HEX_LENGTH : start + PAGE_HEX_LENGTH + 2] in (b"\r\n", b""):
+                offsets.append(start)
+                times.append(mm[pos_time + 10 : end_time][0:-2].decode("utf-8"))
+                temps.append(float(mm[pos_temp + 12 : end_temp]))
+            pos = start + PAGE_HEX_LENGTH
+        self.page_offsets = np.array(offsets, dtype=np.int64)
+        self.page_times = pd.to_datetime(times, format="%Y-%m-%d %H:%M:%S:%f").values
+        self.temperatures = np.array(temps, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.page_offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Releases the memory map and the underlying file.
+        """
+        self._map.close()
+        self._file.close()
+
+    @property
+    def start(self):
+        """
+        Time stamp of the first sample in the file.
+        """
+        return pd.Timestamp(self.page_times[0])
+
+    @property
+    def stop(self):
+        """
+        Time stamp of the last sample in the file.
+        """
+        return pd.Timestamp(self.page_times[-1] + self.last_offset)
+
+    def pages(self, start=None, stop=None):
+        """
+        Finds the pages overlapping a time range.
+
+        :param start: first time stamp of interest (None for the start of the recording)
+        :param stop: last time stamp of interest, inclusive (None for the end of the recording)
+        :return: array of page numbers
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if start is not None:
+            keep &= self.page_times + self.last_offset >= np.datetime64(pd.Timestamp(start))
+        if stop is not None:
+            keep &= self.page_times <= np.datetime64(pd.Timestamp(stop))
+        return np.flatnonzero(keep)
+
+    def data_end(self, time):
+        """
+        Byte offset of the end of the pages starting before a time stamp, i.e. of the part of the file holding every
+        sample recorded before it.
+
+        :param time: time stamp
+        :return: byte offset
+        """
+        count = np.searchsorted(self.page_times, np.datetime64(pd.Timestamp(time)))
+        if count == 0:
+            return self.data_offset
+        return int(self.page_offsets[count - 1]) + PAGE_HEX_LENGTH
+
+    def decode(self, pages):
+        """
+        Decodes a set of pages into a pandas dataframe.
+
+        :param pages: array of page numbers
+        :return: pandas dataframe of GA data
+        """
+        hex_data = b"".join(
+            self._map[o : o + PAGE_HEX_LENGTH] for o in self.page_offsets[pages]
+        )
+        return decode_pages(
+            hex_data,
+            self.page_times[pages],
+            self.temperatures[pages],
+            self.header,
+            self.float_dtype,
+            self.light_dtype,
+        )
+
+    def iter_read(self, start=None, stop=None, pages_per_batch=1200):
+        """
+        Reads the samples recorded between two time stamps in batches of pages, so that a whole recording can be
+        traversed while holding only one batch in memory.
+
+        :param start: first time stamp to read (None for the start of the recording)
+        :param stop: last time stamp to read, inclusive (None for the end of the recording)
+        :param pages_per_batch: number of pages to decode at a time
+        :return: generator of pandas dataframes of GA data
+        """
+        pages = self.pages(start, stop)
+        for i in range(0, len(pages), pages_per_batch):
+            df = self.decode(pages[i : i + pages_per_batch])
+            if start is not None or stop is not None:
+                df = df.loc[start:stop]
+            yield df
+
+    def read(self, start=None, stop=None):
+        """
+        Reads the samples recorded between two time stamps, decoding only the pages that overlap them.
+
+        :param start: first time stamp to read (None for the start of the recording)
+        :param stop: last time stamp to read, inclusive (None for the end of the recording)
+        :return: pandas dataframe of GA data
+        """
+        df = self.decode(self.pages(start, stop))
+        if start is not None or stop is not None:
+            df = df.loc[start:stop]
+        return df
+
+
+def read_bin(full_path, start=None, stop=None, float_dtype=np.float64, light_dtype=np.float64):
+    """
+    Reads a GeneActiv .bin file into a pandas dataframe, decoding all data pages in bulk.
+
+    :param full_path: full path to geneactiv .bin file
+    :param start: first time stamp to read (None for the start of the recording)
+    :param stop: last time stamp to read, inclusive (None for the end of the recording)
+    :param float_dtype: type of the X, Y, Z and T columns
+    :param light_dtype: type of the LUX column
+    :return: pandas dataframe of GA data
+    """
+    with BinReader(full_path, float_dtype, light_dtype) as reader:
+        return reader.read(start, stop)
+
+
+def _csv_time(line):
+    return pd.to_datetime(line.split(b",")[0].decode("utf-8"), format=CSV_TIME_FORMAT)
+
+
+def csv_time_range(full_path):
+    """
+    Reads the time stamps of the first and last samples of a GeneActiv .csv export without parsing the samples in
+    between.
+
+    :param full_path: full path to geneactiv .csv file
+    :return: tuple of first and last time stamps
+    """
+    with open(full_path, "rb") as in_file:
+        for _ in range(CSV_HEADER_LINES):
+            in_file.readline()
+        first = in_file.readline()
+
+        # read backwards from the end of the file until a full line is available
+        size = in_file.seek(0, 2)
+        block = 1024
+        while True:
+            in_file.seek(max(size - block, 0))
+            lines = in_file.read().strip().split(b"\n")
+            if len(lines) > 1 or block >= size:
+                break
+            block *= 2
+        last = lines[-1]
+    return _csv_time(first), _csv_time(last)
+
+
+def csv_offset(full_path, time=None):
+    """
+    Finds the byte offset of the first sample recorded at or after a time stamp in a GeneActiv .csv export, by
+    bisecting the file on the time stamps that start its lines, so that reading can start there without parsing the
+    samples before it.
+
+    :param full_path: full path to geneactiv .csv file
+    :param time: time stamp (None for the first sample)
+    :return: byte offset of the line of the sample (the size of the file if there is none)
+    """
+    with open(full_path, "rb") as in_file:
+        for _ in range(CSV_HEADER_LINES):
+            in_file.readline()
+        lo = in_file.tell()
+        hi = in_file.seek(0, 2)
+        if time is None:
+            return lo
+        time = pd.Timestamp(time)
+
+        # narrow the range down to a block of lines, lo and hi always being line starts
+        while hi - lo > 1 << 16:
+            in_file.seek((lo + hi) // 2)
+            in_file.readline()
+            pos = in_file.tell()
+            line = in_file.readline()
+            if pos >= hi:
+                break
+            if not line.strip() or _csv_time(line) >= time:
+                hi = pos
+            else:
+                lo = pos + len(line)
+
+        # then scan the lines of the block
+        in_file.seek(lo)
+        offset = lo
+        while offset < hi:
+            line = in_file.readline()
+            if not line.strip() or _csv_time(line) >= time:
+                break
+            offset += len(line)
+        return offset
+
+
+def _open_csv_samples(full_path, offset):
+    """
+    Opens a GeneActiv .csv export at the line of a sample.
+
+    :param full_path: full path to geneactiv .csv file
+    :param offset: byte offset of the line (see csv_offset)
+    :return: file object
+    """
+    in_file = open(full_path, "rb")
+    in_file.seek(offset)
+    return in_file
+
+
+def iter_csv(
+    full_path,
+    chunksize=1000000,
+    float_dtype=np.float64,
+    light_dtype=np.int64,
+    offset=None,
+):
+    """
+    Reads a GeneActiv .csv export in chunks of samples.
+
+    :param full_path: full path to geneactiv .csv file
+    :param chunksize: number of samples per chunk
+    :param float_dtype: type of the X, Y, Z and T columns
+    :param light_dtype: type of the LUX column
+    :param offset: byte offset of the line of the first sample to read (see csv_offset), None for the first sample of
+    the file
+    :return: generator of pandas dataframes of GA data
+    """
+    source = full_path if offset is None else _open_csv_samples(full_path, offset)
+    reader = pd.read_csv(
+        source,
+        index_col=0,
+        skiprows=CSV_HEADER_LINES if offset is None else 0,
+        header=None,
+        names=["Time", "X", "Y", "Z", "LUX", "Button", "T"],
+        usecols=["Time", "X", "Y", "Z", "LUX", "T"],
+        dtype={
+            "Time": object,
+            "X": float_dtype,
+            "Y": float_dtype,
+            "Z": float_dtype,
+            "LUX": light_dtype,
+            "Button": bool,
+            "T": float_dtype,
+        },
+        chunksize=chunksize,
+    )
+    try:
+        for chunk in reader:
+            chunk.index = pd.to_datetime(chunk.index, format=CSV_TIME_FORMAT).values
+            yield chunk
+    finally:
+        reader.close()
+        if offset is not None:
+            source.close()
+
+
+def parse_csv_times(times):
+    """
+    Parses the YYYY-mm-dd HH:MM:SS:fff time stamps of a GeneActiv .csv export. Time stamps are fixed width, so the
+    digits of every field are read straight out of the character buffer of the Arrow array and combined arithmetically,
+    with no per-string work. Arrays that do not hold fixed width time stamps are parsed with pandas instead.
+
+    :param times: pyarrow string array of time stamps
+    :return: numpy datetime64[ns] array
+    """
+    n = len(times)
+    offsets = np.frombuffer(times.buffers()[1], dtype=np.int32)
+    offsets = offsets[times.offset : times.offset + n + 1]
+    if n and times.null_count == 0 and offsets[-1] - offsets[0] == n * CSV_TIME_LENGTH:
+        chars = np.frombuffer(times.buffers()[2], dtype=np.uint8)
+        chars = chars[offsets[0] : offsets[-1]].reshape(n, CSV_TIME_LENGTH)
+        digits = chars[:, [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 22]]
+        digits = digits.astype(np.int64) - ord("0")
+        if np.all(np.diff(offsets) == CSV_TIME_LENGTH) and np.all((digits >= 0) & (digits <= 9)):
+
+            def field(first, last):
+                value = digits[:, first]
+                for i in range(first + 1, last):
+                    value = value * 10 + digits[:, i]
+                return value
+
+            dates = (field(0, 4) - 1970).astype("datetime64[Y]")
+            dates = dates.astype("datetime64[M]") + (field(4, 6) - 1)
+            dates = dates.astype("datetime64[D]") + (field(6, 8) - 1)
+            ms = ((field(8, 10) * 60 + field(10, 12)) * 60 + field(12, 14)) * 1000 + field(14, 17)
+            return dates.astype("datetime64[ns]") + ms.astype("timedelta64[ms]")
+    return pd.to_datetime(times.to_pandas(), format=CSV_TIME_FORMAT).values
+
+
+def iter_csv_arrow(
+    full_path,
+    float_dtype=np.float64,
+    light_dtype=np.int64,
+    block_size=1 << 24,
+    use_threads=True,
+    offset=None,
+):
+    """
+    Reads a GeneActiv .csv export in batches of samples with the streaming, multithreaded pyarrow CSV reader. The
+    columns are parsed straight into their types, and the time stamps with parse_csv_times.
+
+    :param full_path: full path to geneactiv .csv file
+    :param float_dtype: type of the X, Y, Z and T columns
+    :param light_dtype: type of the LUX column
+    :param block_size: number of bytes of the file parsed per batch
+    :param use_threads: boolean flag to parse with multiple threads
+    :param offset: byte offset of the line of the first sample to read (see csv_offset), None for the first sample of
+    the file
+    :return: generator of pandas dataframes of GA data
+    """
+    import pyarrow as pa
+    from pyarrow import csv
+
+    float_type = pa.from_numpy_dtype(np.dtype(float_dtype))
+    source = full_path if offset is None else _open_csv_samples(full_path, offset)
+    reader = csv.open_csv(
+        source,
+        read_options=csv.ReadOptions(
+            use_threads=use_threads,
+            block_size=block_size,
+            skip_rows=CSV_HEADER_LINES if offset is None else 0,
+            column_names=CSV_COLUMNS,
+        ),
+        convert_options=csv.ConvertOptions(
+            column_types={
+                "Time": "string",
+                "X": float_type,
+                "Y": float_type,
+                "Z": float_type,
+                "LUX": pa.from_numpy_dtype(np.dtype(light_dtype)),
+                "T": float_type,
+            },
+            include_columns=["Time", "X", "Y", "Z", "LUX", "T"],
+        ),
+    )
+    try:
+        for batch in reader:
+            yield pd.DataFrame(
+                {
+                    name: batch.column(name).to_numpy()
+                    for name in ["X", "Y", "Z", "LUX", "T"]
+                },
+                index=parse_csv_times(batch.column("Time")),
+            )
+    finally:
+        if offset is not None:
+            source.close()
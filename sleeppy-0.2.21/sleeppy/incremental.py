@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+__all__ = ["digest_range", "DayManifest"]
+
+
+def digest_range(path, offset, length, block_size=1 << 24):
+    """
+    Digest of a range of bytes of a file.
+
+    :param path: path of the file
+    :param offset: byte offset of the range
+    :param length: number of bytes of the range
+    :param block_size: number of bytes read at a time
+    :return: hex digest, or None if the file is shorter than the range
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while length > 0:
+            block = f.read(min(block_size, length))
+            if not block:
+                return None
+            digest.update(block)
+            length -= len(block)
+    return digest.hexdigest()
+
+
+class DayManifest:
+    """
+    Manifest of the days of a recording processed in incremental mode, saved as a json file holding the key of the
+    parameters and code the days were processed with, the noon every day starts at, and the digest of the recorded data
+    preceding the last day. Every day but the last one is finalized: its outputs are kept as long as the key and the
+    recorded data preceding the last day are unchanged, while the last day is processed again with the data appended
+    to the recording.
+    """
+
+    def __init__(self, path):
+        """
+        Initialization of the class
+
+        :param path: path of the manifest file
+        """
+        self.path = path
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        self.key = manifest.get("key")
+        self.days = {int(day): pd.Timestamp(noon) for day, noon in manifest.get("days", {}).items()}
+        self.prefix = manifest.get("prefix")
+
+    def resume(self, key, digest):
+        """
+        Finds where processing resumes: at the last day of the previous run, if the key and the recorded data of the
+        finalized days are unchanged, or else at the start of the recording.
+
+        :param key: key of the parameters and code of this run
+        :param digest: function returning the digest of a number of bytes of the recorded data
+        :return: tuple of the first day to process and the noon to split the recording from (None for the start)
+        """
+        if key != self.key or len(self.days) < 2 or self.prefix is None:
+            return 1, None
+        if digest(self.prefix["length"]) != self.prefix["digest"]:
+            return 1, None
+        last = max(self.days)
+        return last, self.days[last]
+
+    def update(self, key, days, length, digest):
+        """
+        Records the days processed by a run.
+
+        :param key: key of the parameters and code of the run
+        :param days: dictionary of day number to the noon it starts at, of every day of the recording
+        :param length: number of bytes of the recorded data preceding the last day
+        :param digest: digest of these bytes
+        """
+        self.key = key
+        self.days = dict(days)
+        self.prefix = {"length": int(length), "digest": digest}
+        self._save()
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "key": self.key,
+                    "days": {str(day): str(noon) for day, noon in sorted(self.days.items())},
+                    "prefix": self.prefix,
+                },
+                f,
+                indent=2,
+            )
+        os.replace(tmp, self.path)
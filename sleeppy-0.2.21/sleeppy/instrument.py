@@ -0,0 +1,179 @@
+import os
+import sys
+import csv
+import json
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+__all__ = ["reset_peak_rss", "peak_rss_mb", "io_counters", "measure", "Instrument"]
+
+FIELDS = [
+    "stage",
+    "day",
+    "pid",
+    "wall_time_s",
+    "cpu_time_s",
+    "peak_rss_mb",
+    "rows",
+    "bytes_read",
+    "bytes_written",
+]
+
+
+_measuring = []  # records of the measurements open in this process, innermost last
+
+
+def reset_peak_rss():
+    """
+    Resets the peak resident set size of the current process to its current resident set size (Linux only).
+
+    :return: boolean, whether the peak was reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of the current process since it was last reset by reset_peak_rss. Where the peak cannot be
+    reset (other systems than Linux), it is the peak since the process started.
+
+    :return: peak rss in MB, or None if it is not available
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2.0 ** 10  # kilobytes
+    except (OSError, ValueError):
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss / 2.0 ** 20  # bytes
+    return rss / 2.0 ** 10  # kilobytes
+
+
+def _max(a, b):
+    return b if a is None or (b is not None and b > a) else a
+
+
+def io_counters():
+    """
+    Bytes read and written by the current process through system calls (memory-mapped reads are not counted).
+
+    :return: tuple of bytes read and bytes written, or (None, None) if they are not available
+    """
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+@contextmanager
+def measure(stage, day=None):
+    """
+    Measures a block of code. The record is filled in when the block exits, its rows can be set inside the block. The
+    peak rss is the peak over the block: the peak is reset when the block starts, after being taken into account by
+    the blocks it is nested in. Where the peak cannot be reset it is the peak of the process so far.
+
+    :param stage: name of the stage
+    :param day: day number, None for a whole stage
+    :return: record dictionary
+    """
+    record = dict.fromkeys(FIELDS)
+    record.update(stage=stage, day=day, pid=os.getpid(), rows=0)
+    wall, cpu = time.perf_counter(), time.process_time()
+    read, written = io_counters()
+    peak = peak_rss_mb()
+    for parent in _measuring:
+        parent["peak_rss_mb"] = _max(parent["peak_rss_mb"], peak)
+    reset_peak_rss()
+    _measuring.append(record)
+    try:
+        yield record
+    finally:
+        _measuring.remove(record)
+        record["wall_time_s"] = time.perf_counter() - wall
+        record["cpu_time_s"] = time.process_time() - cpu
+        record["peak_rss_mb"] = _max(record["peak_rss_mb"], peak_rss_mb())
+        if read is not None:
+            end_read, end_written = io_counters()
+            record["bytes_read"] = end_read - read
+            record["bytes_written"] = end_written - written
+
+
+class Instrument:
+    """
+    Collects the measurements of the stages of a SleepPy run and of the days within each stage.
+    """
+
+    def __init__(self, callback=None):
+        """
+        Initialization of the class
+
+        :param callback: function called with every record as it is completed
+        """
+        self.records = []
+        self.callback = callback
+        self._open = []
+
+    @contextmanager
+    def stage(self, stage):
+        """
+        Measures a whole stage.
+
+        :param stage: name of the stage
+        :return: record dictionary
+        """
+        with measure(stage) as record:
+            self._open.append(record)
+            try:
+                yield record
+            finally:
+                self._open.pop()
+        self.add(record)
+
+    def add(self, record):
+        """
+        Adds a completed record.
+
+        :param record: record dictionary
+        """
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def count_rows(self, rows):
+        """
+        Counts rows processed in the stages that are open.
+
+        :param rows: number of rows
+        """
+        for parent in self._open:
+            parent["rows"] += rows
+
+    def save(self, path):
+        """
+        Saves the records as a json run report and a csv table.
+
+        :param path: path of the report, without extension
+        """
+        with open(path + ".json", "w") as f:
+            json.dump(self.records, f, indent=2)
+        with open(path + ".csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(self.records)
@@ -0,0 +1,328 @@
+import os
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import matplotlib
+
+try:
+    matplotlib.use("Agg")
+except Exception as e:
+    print("Error: could not use Agg as backend")
+    pass
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+import seaborn as sns
+
+sns.set()
+__all__ = ["PLOT_SERIES", "plot_day", "plot_summary", "render_reports"]
+
+# 1 minute series plotted in the visual report of every day
+PLOT_SERIES = [
+    "X",
+    "Y",
+    "Z",
+    "LUX",
+    "T",
+    "activity_index",
+    "arm_angle",
+    "sleep_wake",
+    "rest_periods",
+    "wear",
+    "wear_rescored",
+]
+PLOT_SERIES_FILE = "/plot_series.csv"
+ENDPOINTS_FILE = "/sleep_endpoints_summary.csv"
+
+
+def plot_day(series, endpoints, src_name, day, temperature_threshold, path):
+    """
+    Generates the visual report of one day.
+
+    :param series: pandas dataframe of the 1 minute plot series of the day (see PLOT_SERIES), starting at noon, where
+    sleep_wake, rest_periods, wear and wear_rescored are 1 when wake, resting and on body respectively, NaN otherwise
+    :param endpoints: pandas dataframe of the endpoints of every day
+    :param src_name: name of the source recording
+    :param day: day number (starting at 1)
+    :param temperature_threshold: minimum temperature at which a rest period was accepted
+    :param path: path of the pdf report
+    """
+    # shared index
+    idx = pd.date_range(start=series.index[0], periods=1440, freq="60s")
+    series = series.set_axis(idx)
+    raw = series[["X", "Y", "Z", "T", "LUX"]].copy()
+    aindex = series[["activity_index"]]
+    angle = series["arm_angle"]
+
+    # build a dataframe for plotting certain data streams as straight lines
+    df = pd.DataFrame(
+        {
+            "wake": series["sleep_wake"].values,
+            "rest periods": series["rest_periods"].values - 0.05,
+            "on body": series["wear"].values - 0.1,
+            "on body(rescore)": series["wear_rescored"].values - 0.15,
+        },
+        index=idx,
+    )
+
+    # get day endpoints for plotting of table
+    t_labels = (
+        "Total Sleep Time(minutes)",
+        "Percent Time Asleep",
+        "Wake After Sleep Onset(minutes)",
+        "Sleep Onset Latency(minutes)",
+        "Number of Wake Bouts",
+    )
+    t_vals = [np.array([int(endpoints.loc[day]["total_sleep_time"] / 60.0),
+              endpoints.loc[day]["sleep_efficiency"],
+              int(endpoints.loc[day]["waso"] / 60.0),
+              int(endpoints.loc[day]["sleep_onset_latency"] / 60.0),
+              endpoints.loc[day]["num_active_periods"]])]
+
+    # plotting
+    fig, (axt, ax0, ax1, ax2, ax3, ax4, ax5) = plt.subplots(
+        7, 1, figsize=(30, 15)
+    )
+    plt.suptitle(
+        "Visual Report for Source: {}\nDay: {}\nDate: {}".format(
+            src_name, day, idx[0].date()
+        ),
+        fontsize=25,
+    )
+    hours = mdates.HourLocator(interval=1)
+    h_fmt = mdates.DateFormatter("%H:%M")
+    all_axes = (ax0, ax1, ax2, ax3, ax4, ax5)
+
+    # plot table
+    tbl = axt.table(
+        cellText=t_vals,
+        colLabels=t_labels,
+        cellLoc="center",
+        rowLoc="center",
+        loc="center",
+        fontsize=20,
+    )
+    tbl.auto_set_font_size(False)
+    tbl.set_fontsize(24)
+    tbl.scale(1.1, 2.4)
+    axt.axis("off")
+
+    # plot raw
+    raw.rename(columns={"T": "Temperature", "LUX": "Light"}, inplace=True)
+    raw[["X", "Y", "Z"]].plot(ax=ax0, lw=1).legend(
+        bbox_to_anchor=(0, 1), fontsize=20
+    )
+    ax0.set_ylabel("")
+    ax0.set_xlabel("")
+
+    # plot temperature
+    raw[["Temperature"]].plot(
+        ax=ax1, lw=1, color=sns.xkcd_rgb["pale red"]
+    ).legend(bbox_to_anchor=(0, 1), fontsize=20)
+    ax1.axhline(y=temperature_threshold, color="r", linestyle="--", lw=2)
+    props = dict(boxstyle="round", facecolor="lavender", alpha=0.35)
+    textstr = u"max: {}\xb0C\nmin: {}\xb0C\nthresh: {}\xb0C".format(
+        raw[["Temperature"]].max().values[0],
+        raw[["Temperature"]].min().values[0],
+        temperature_threshold,
+    )
+    ax1.text(
+        0.005,
+        0.95,
+        textstr,
+        transform=ax1.transAxes,
+        fontsize=14,
+        verticalalignment="top",
+        bbox=props,
+    )
+    ax1.set_ylabel("")
+    ax1.set_xlabel("")
+
+    # plot light
+    raw[["Light"]].plot(ax=ax2, lw=1, color=sns.xkcd_rgb["pale orange"]).legend(
+        bbox_to_anchor=(0, 1), fontsize=20
+    )
+    ax2.set_ylabel("")
+    ax2.set_xlabel("")
+
+    # plot activity index
+    aindex.plot(ax=ax3, lw=1, color="#6fc276").legend(
+        labels=["activity"], bbox_to_anchor=(0, 0.75), fontsize=20
+    )
+    ax3.set_ylabel("")
+    ax3.set_xlabel("")
+
+    # plot arm angle
+    angle.plot(ax=ax4, lw=1, color="#b36ff6").legend(
+        labels=["arm angle"], bbox_to_anchor=(0, 0.75), fontsize=20
+    )
+    ax4.set_ylabel("")
+    ax4.set_xlabel("")
+
+    # plot dataframe of 4 streams
+    df.plot(ax=ax5, lw=8, x_compat=True).legend(
+        bbox_to_anchor=(0, 1.3), fontsize=20
+    )
+    ax5.set_ylabel("")
+    ax5.set_xlabel("")
+
+    # plot formatting
+    plt.draw()
+    count = 0
+    for ax in all_axes:
+        count += 1
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        ax.spines["bottom"].set_visible(False)
+        ax.spines["left"].set_visible(False)
+        ax.grid(False)
+        if count < 6:
+            ax.get_xaxis().set_ticks([])
+        ax.get_yaxis().set_ticks([])
+    ax5.xaxis.set_major_locator(hours)
+    ax5.xaxis.set_major_formatter(h_fmt)
+    plt.subplots_adjust(wspace=0, hspace=0)
+    fig.autofmt_xdate()
+    for tick in ax5.xaxis.get_major_ticks():
+        tick.label1.set_fontsize(16)
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_summary(endpoints, src_name, path):
+    """
+    Generates the summary report of the endpoints of every day.
+
+    :param endpoints: pandas dataframe of the endpoints of every day
+    :param src_name: name of the source recording
+    :param path: path of the pdf report
+    """
+    # generate a summary plot from endpoint data
+    fig, (ax0, ax1, ax2, ax3, ax4) = plt.subplots(5, 1, figsize=(12, 12))
+    plt.suptitle("Summary Report for Source: {}".format(src_name), fontsize=16)
+    all_axes = (ax0, ax1, ax2, ax3, ax4)
+    ylabels = [
+        "Total Sleep\nTime(min)\nMean: {}".format(
+            int(np.round(endpoints.total_sleep_time.mean()))
+        ),
+        "Percent Time\nAsleep\nMean: {}".format(
+            int(np.round(endpoints.sleep_efficiency.mean()))
+        ),
+        "Wake After\nSleep Onset(min)\nMean: {}".format(
+            int(np.round(endpoints.waso.mean()))
+        ),
+        "Sleep Onset\nLatency(min)\nMean: {}".format(
+            int(np.round(endpoints.sleep_onset_latency.mean()))
+        ),
+        "Number of\nWake Bouts\nMean: {}".format(
+            int(np.round(endpoints.num_active_periods.mean()))
+        ),
+    ]
+
+    # plot total sleep time
+    endpoints.total_sleep_time.plot.bar(ax=ax0, title="")
+    # plot percent time asleep
+    endpoints.sleep_efficiency.plot.bar(ax=ax1, title="")
+    # plot wake after sleep onset
+    endpoints.waso.plot.bar(ax=ax2, title="")
+    # plot sleep onset latency
+    endpoints.sleep_onset_latency.plot.bar(ax=ax3, title="")
+    # plot the number of wake bouts
+    endpoints.num_active_periods.plot.bar(ax=ax4, title="")
+    # plot formatting
+    count = 0
+    for ax in all_axes:
+        count += 1
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        ax.spines["bottom"].set_visible(False)
+        ax.spines["left"].set_visible(False)
+        ax.grid(False)
+        ax.set_ylabel(ylabels[count - 1], rotation=0, fontsize=12, labelpad=50)
+        if count < 5:
+            ax.set_xlabel("")
+            ax.get_xaxis().set_ticks([])
+            ax.get_yaxis().set_ticks([])
+        else:
+            ax.set_xlabel("Day", fontsize=20)
+            ax.get_yaxis().set_ticks([])
+        plt.setp(ax.xaxis.get_majorticklabels(), rotation=0)
+        for p in ax.patches:
+            ax.annotate(
+                np.round(p.get_height(), decimals=2),
+                (p.get_x() + p.get_width() / 2.0, 0),
+                ha="center",
+                va="center",
+                xytext=(0, 10),
+                textcoords="offset points",
+                fontweight="bold",
+            )
+    plt.subplots_adjust(wspace=0, hspace=0.01)
+    plt.xticks(fontsize=20)
+    plt.draw()
+    plt.savefig(path)
+    plt.close()
+
+
+def render_reports(directory, src_name=None, temperature_threshold=25.0, workers=1):
+    """
+    Renders the visual reports of a recording processed with lazy_reports, from the plot series and the endpoints
+    saved in its results directory. The report of every day is rendered in a pool of worker processes if workers is
+    more than 1.
+
+    :param directory: results directory of the recording (<results_directory>/<recording name>/results), where the
+    reports are saved
+    :param src_name: name of the source recording (default the name of the parent directory)
+    :param temperature_threshold: minimum temperature at which a rest period was accepted
+    :param workers: number of processes to render the reports in
+    :return: list of paths of the reports
+    """
+    if src_name is None:
+        src_name = os.path.basename(os.path.dirname(os.path.abspath(directory)))
+    series = pd.read_csv(
+        directory + PLOT_SERIES_FILE,
+        index_col="Time",
+        parse_dates=True,
+        float_precision="round_trip",
+    )
+    endpoints = pd.read_csv(directory + ENDPOINTS_FILE, index_col="day")
+
+    days = list(series.day.unique())
+    paths = [directory + "/Visual_Results_Day_{}.pdf".format(day) for day in days]
+    args = (
+        [series.loc[series.day == day, PLOT_SERIES] for day in days],
+        [endpoints] * len(days),
+        [src_name] * len(days),
+        days,
+        [temperature_threshold] * len(days),
+        paths,
+    )
+    if workers > 1 and len(days) > 1:
+        with ProcessPoolExecutor(min(workers, len(days))) as pool:
+            list(pool.map(plot_day, *args))
+    else:
+        for a in zip(*args):
+            plot_day(*a)
+
+    paths.append(directory + "/Summary_Report.pdf")
+    plot_summary(endpoints, src_name, paths[-1])
+    return paths
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="""Render the visual reports of a recording processed
+                by SleepPy with lazy_reports.""", add_help=True
+    )
+
+    parser.add_argument('--resultsDirectory', metavar='results_directory', type=str, required=True)
+    parser.add_argument('--temperatureThreshold', metavar='temperature_threshold', type=float, default=25.0)
+    parser.add_argument('--workers', metavar='workers', type=int, default=1)
+    args = parser.parse_args()
+
+    for path in render_reports(
+        args.resultsDirectory,
+        temperature_threshold=args.temperatureThreshold,
+        workers=args.workers,
+    ):
+        print("Rendered: {}".format(path))
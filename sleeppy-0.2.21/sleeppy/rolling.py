@@ -0,0 +1,127 @@
+from math import gcd
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+__all__ = ["window_starts", "strided_std", "strided_range", "rolling_median"]
+
+
+def window_starts(num_samples, step):
+    """
+    Start indices of strided windows, one every step samples for as long as more than one step of data remains.
+
+    :param num_samples: number of samples in the signal
+    :param step: number of samples between the starts of consecutive windows
+    :return: array of window start indices
+    """
+    return np.arange(0, max(num_samples - step, 0), step)
+
+
+def _blocks(num_samples, window, step):
+    """
+    Splits a signal into blocks whose size divides both the window and the step, so that every strided window is made
+    up of whole blocks (except at the end of the signal, where windows are truncated).
+
+    :param num_samples: number of samples in the signal
+    :param window: number of samples per window
+    :param step: number of samples between the starts of consecutive windows
+    :return: tuple of block size and block start indices
+    """
+    block = gcd(window, step)
+    return block, np.arange(0, num_samples, block)
+
+
+def strided_std(data, window, step):
+    """
+    Calculate the standard deviation (ddof=1) of every channel over strided, overlapping windows. Windows running past
+    the end of the signal are truncated. Sums and sums of squares are reduced once per block and the window sums are
+    taken from their cumulative sums, so every sample is visited once regardless of how much the windows overlap.
+
+    :param data: array of shape (samples, channels)
+    :param window: number of samples per window
+    :param step: number of samples between the starts of consecutive windows
+    :return: tuple of window start indices and array of shape (windows, channels) of std values
+    """
+    data = np.asarray(data, dtype=np.float64)
+    starts = window_starts(len(data), step)
+    if not len(starts):
+        return starts, np.empty((0, data.shape[1]))
+    stops = np.minimum(starts + window, len(data))
+    block, block_starts = _blocks(len(data), window, step)
+
+    # center the signal first to keep the sums of squares well conditioned
+    centered = data - data.mean(axis=0)
+    cs = np.zeros((len(block_starts) + 1, data.shape[1]))
+    cs2 = np.zeros((len(block_starts) + 1, data.shape[1]))
+    np.cumsum(np.add.reduceat(centered, block_starts, axis=0), axis=0, out=cs[1:])
+    np.cumsum(np.add.reduceat(centered ** 2, block_starts, axis=0), axis=0, out=cs2[1:])
+
+    # window sums from the cumulative block sums
+    first = starts // block
+    last = np.minimum(first + window // block, len(block_starts))
+    n = (stops - starts)[:, None].astype(np.float64)
+    s = cs[last] - cs[first]
+    s2 = cs2[last] - cs2[first]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = np.maximum(s2 - s ** 2 / n, 0.0) / (n - 1)
+    return starts, np.sqrt(var)
+
+
+def strided_range(data, window, step):
+    """
+    Calculate the range (max - min) of every channel over strided, overlapping windows. Windows running past the end of
+    the signal are truncated. The signal is reduced once into block-wise max and min values, and the range of each
+    window is taken from the max and min of its blocks.
+
+    :param data: array of shape (samples, channels)
+    :param window: number of samples per window
+    :param step: number of samples between the starts of consecutive windows
+    :return: tuple of window start indices and array of shape (windows, channels) of range values
+    """
+    data = np.asarray(data, dtype=np.float64)
+    starts = window_starts(len(data), step)
+    if not len(starts):
+        return starts, np.empty((0, data.shape[1]))
+
+    # block-wise max and min
+    block, block_starts = _blocks(len(data), window, step)
+    block_max = np.maximum.reduceat(data, block_starts, axis=0)
+    block_min = np.minimum.reduceat(data, block_starts, axis=0)
+
+    # max and min over the blocks of each window, padding past the end of the signal
+    per_window = window // block
+    pad = np.full((per_window - 1, data.shape[1]), np.inf)
+    block_max = np.concatenate([block_max, -pad])
+    block_min = np.concatenate([block_min, pad])
+    first = starts // block
+    wmax = np.full((len(starts), data.shape[1]), -np.inf)
+    wmin = np.full((len(starts), data.shape[1]), np.inf)
+    for k in range(per_window):
+        np.maximum(wmax, block_max[first + k], out=wmax)
+        np.minimum(wmin, block_min[first + k], out=wmin)
+    return starts, wmax - wmin
+
+
+def rolling_median(values, num_samples, batch_size=100000):
+    """
+    Calculate the median of forward looking windows starting at every sample, for as long as a full window and at
+    least one more sample remain. NaN values are ignored, as in pandas. All windows of a batch are taken as strided
+    views of the signal and reduced in a single median call.
+
+    :param values: 1d array of values
+    :param num_samples: number of samples to include in the window
+    :param batch_size: number of windows to reduce at a time
+    :return: array of rolling median values, one per window start
+    """
+    values = np.asarray(values, dtype=np.float64)
+    num_windows = max(len(values) - num_samples, 0)
+    if not num_windows:
+        return np.empty(0)
+    windows = sliding_window_view(values, num_samples)[:num_windows]
+    med = np.empty(num_windows)
+    median = np.nanmedian if np.isnan(values).any() else np.median
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # windows with no valid values
+        for idx in range(0, num_windows, batch_size):
+            med[idx : idx + batch_size] = median(windows[idx : idx + batch_size], axis=1)
+    return med
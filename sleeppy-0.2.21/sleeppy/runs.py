@@ -0,0 +1,77 @@
+import numpy as np
+
+__all__ = [
+    "run_lengths",
+    "decode_runs",
+    "fill_runs",
+    "inner_runs",
+    "longest_run",
+]
+
+
+def run_lengths(values):
+    """
+    Run-length encodes a 1d array. A new run starts wherever a value differs from the previous one, NaN values included,
+    which matches grouping by (x.diff().ne(0)).cumsum().
+
+    :param values: 1d array of values
+    :return: tuple of run start indices, run lengths and run values
+    """
+    values = np.asarray(values)
+    if not len(values):
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), values[:0]
+    starts = np.r_[0, np.flatnonzero(values[1:] != values[:-1]) + 1]
+    lengths = np.diff(np.r_[starts, len(values)])
+    return starts, lengths, values[starts]
+
+
+def decode_runs(run_values, lengths):
+    """
+    Expands runs back into a 1d array.
+
+    :param run_values: array of run values
+    :param lengths: array of run lengths
+    :return: 1d array of values
+    """
+    return np.repeat(run_values, lengths)
+
+
+def fill_runs(run_values, lengths, mask, fill):
+    """
+    Overwrites the selected runs with a fill value and expands the result. Runs filled with the value of their
+    neighbours are merged with them when the result is encoded again.
+
+    :param run_values: array of run values
+    :param lengths: array of run lengths
+    :param mask: boolean array selecting the runs to overwrite
+    :param fill: value to write into the selected runs
+    :return: 1d array of values
+    """
+    return decode_runs(np.where(mask, fill, run_values), lengths)
+
+
+def inner_runs(num_runs):
+    """
+    Selects every run except the first and the last.
+
+    :param num_runs: number of runs
+    :return: boolean mask over the runs
+    """
+    mask = np.zeros(num_runs, dtype=bool)
+    mask[1:-1] = True
+    return mask
+
+
+def longest_run(run_values, lengths, value):
+    """
+    Finds the longest run of a given value (the first one in case of ties).
+
+    :param run_values: array of run values
+    :param lengths: array of run lengths
+    :param value: value of the runs to consider
+    :return: index of the longest run, or None if there is no run of that value
+    """
+    candidates = np.flatnonzero(run_values == value)
+    if not len(candidates):
+        return None
+    return candidates[np.argmax(lengths[candidates])]
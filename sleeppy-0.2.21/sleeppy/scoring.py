@@ -0,0 +1,362 @@
+from collections import deque
+import numpy as np
+from scipy import signal
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the numpy kernel is used without it
+    njit = None
+
+__all__ = [
+    "CK_WEIGHTS",
+    "DEFAULT_SF",
+    "webster_rescore",
+    "cole_kripke_nights",
+    "cole_kripke_sweep",
+    "OnlineColeKripke",
+]
+
+# Cole-Kripke weights, ordered for np.convolve
+CK_WEIGHTS = np.array([4.64, 6.87, 3.75, 5.07, 16.19, 5.84, 4.024, 0.00, 0.00])[::-1]
+DEFAULT_SF = 0.193125
+
+# without numba, nights are rescored one by one in plain Python below this many nights, and stepped together with numpy
+# from it (the numpy kernel pays a fixed cost per epoch, which only pays off for a few hundred nights)
+NUMPY_MIN_ROWS = 256
+
+
+def _webster_row(rescored):
+    """
+    Webster's rescoring rules applied in place to a single night, epoch by epoch exactly as in ColeKripke.rescore.
+    Written with plain loops so that it can be compiled with numba, and run on a list without it.
+
+    :param rescored: 1d float array (or list) of predictions, modified in place
+    """
+    n = len(rescored)
+    # rules a through c
+    wake_bin = 0
+    for t in range(n):
+        if rescored[t] == 1:
+            wake_bin += 1
+        else:
+            if 14 < wake_bin:
+                fill = 4
+            elif 9 < wake_bin < 15:
+                fill = 3
+            elif 3 < wake_bin < 10:
+                fill = 1
+            else:
+                fill = 0
+            for k in range(t, min(t + fill, n)):
+                rescored[k] = 1.0
+            wake_bin = 0
+    # rule d
+    sleep_bin = 0
+    start_ind = 0
+    for t in range(10, n - 10):
+        if rescored[t] == 0:
+            sleep_bin += 1
+            if sleep_bin == 1:
+                start_ind = t
+        else:
+            if 0 < sleep_bin <= 6:
+                before = 0.0
+                for k in range(start_ind - 10, start_ind):
+                    before += rescored[k]
+                after = 0.0
+                for k in range(t, t + 10):
+                    after += rescored[k]
+                if before == 10.0 and after == 10.0:
+                    for k in range(start_ind, t):
+                        rescored[k] = 1.0
+            sleep_bin = 0
+
+
+def _webster_rows(rescored):
+    """
+    Webster's rescoring rules applied in place to every row of a 2d array.
+
+    :param rescored: 2d float array of predictions (nights x epochs), modified in place
+    """
+    for i in range(rescored.shape[0]):
+        _webster_row(rescored[i])
+
+
+def _webster_rows_python(rescored):
+    """
+    Webster's rescoring rules applied in place to every row of a 2d array, one night at a time on a list, which is
+    faster than indexing the array epoch by epoch.
+
+    :param rescored: 2d float array of predictions (nights x epochs), modified in place
+    """
+    for i in range(rescored.shape[0]):
+        row = rescored[i].tolist()
+        _webster_row(row)
+        rescored[i] = row
+
+
+def _webster_rows_numpy(rescored):
+    """
+    Webster's rescoring rules applied in place to every row of a 2d array. Epochs are visited in order, as in the
+    original loops, but each step updates all nights at once.
+
+    :param rescored: 2d float array of predictions (nights x epochs), modified in place
+    """
+    rows, n = rescored.shape
+    # rules a through c; sleep epochs rescored by a rule are carried forward as pending epochs
+    wake_bin = np.zeros(rows, dtype=np.int64)
+    pending = np.zeros(rows, dtype=np.int64)
+    for t in range(n):
+        forced = pending > 0
+        rescored[forced, t] = 1.0
+        pending[forced] -= 1
+        wake = rescored[:, t] == 1
+        fill = np.select(
+            [14 < wake_bin, (9 < wake_bin) & (wake_bin < 15), (3 < wake_bin) & (wake_bin < 10)],
+            [4, 3, 1],
+            0,
+        )
+        fill[wake] = 0
+        rescored[fill > 0, t] = 1.0
+        pending = np.where(fill > 0, fill - 1, pending)
+        wake_bin = np.where(wake, wake_bin + 1, 0)
+
+    # rule d; the few closing sleep bouts are checked one by one
+    sleep_bin = np.zeros(rows, dtype=np.int64)
+    start_ind = np.zeros(rows, dtype=np.int64)
+    for t in range(10, n - 10):
+        sleep = rescored[:, t] == 0
+        closing = np.flatnonzero(~sleep & (0 < sleep_bin) & (sleep_bin <= 6))
+        for i in closing:
+            s = start_ind[i]
+            if sum(rescored[i, s - 10 : s]) == 10.0 and sum(rescored[i, t : t + 10]) == 10.0:
+                rescored[i, s:t] = 1.0
+        start_ind = np.where(sleep & (sleep_bin == 0), t, start_ind)
+        sleep_bin = np.where(sleep, sleep_bin + 1, 0)
+
+
+if njit is not None:
+    _webster_row = njit(cache=True)(_webster_row)
+    _webster_rows = njit(cache=True)(_webster_rows)
+else:
+    _webster_rows = _webster_rows_python
+
+
+def webster_rescore(predictions):
+    """
+    Application of Webster's rescoring rules as described in the Cole-Kripke paper, to one night or to many nights at
+    once. The result is identical to ColeKripke.rescore. Compiled with numba when it is installed, otherwise the
+    nights are rescored one by one in plain Python, or together with numpy from NUMPY_MIN_ROWS nights.
+
+    :param predictions: 1d array of predictions, or 2d array of shape (nights, epochs)
+    :return: array of rescored predictions with the shape of the input
+    """
+    rescored = np.array(predictions, dtype=np.float64)
+    rows = rescored[None, :] if rescored.ndim == 1 else rescored
+    if njit is None and len(rows) >= NUMPY_MIN_ROWS:
+        _webster_rows_numpy(rows)
+    else:
+        _webster_rows(rows)
+    return rescored
+
+
+def _convolve_nights(activity, kernel):
+    """
+    Convolves every night with the Cole-Kripke kernel in a single call, as np.convolve(..., "same") does per night.
+
+    :param activity: 2d array of epoch level activity index values (nights x epochs)
+    :param kernel: 1d convolution kernel
+    :return: 2d array of scores (nights x epochs)
+    """
+    return signal.convolve(activity, kernel[None, :], mode="same", method="direct")
+
+
+def _threshold(scores):
+    """
+    Turns scores into sleep (0) and wake (1) predictions in place, leaving NaN scores untouched.
+
+    :param scores: array of scores
+    :return: array of predictions
+    """
+    wake = scores >= 0.5
+    scores[scores < 0.5] = 0
+    scores[wake] = 1
+    return scores
+
+
+def cole_kripke_nights(activity, sf=DEFAULT_SF):
+    """
+    Runs the prediction of sleep wake states for many nights of activity index data in one call. Each night is scored
+    as by ColeKripke.predict.
+
+    :param activity: 2d array of epoch level activity index values (nights x epochs)
+    :param sf: scale factor to use for the predictions
+    :return: 2d array of rescored predictions (nights x epochs)
+    """
+    activity = np.atleast_2d(np.asarray(activity, dtype=np.float64))
+    scores = _threshold(_convolve_nights(activity, sf * CK_WEIGHTS))
+    return webster_rescore(scores)
+
+
+def cole_kripke_sweep(activity, scale_factors):
+    """
+    Runs the prediction of sleep wake states for many nights and many scale factors, e.g. to calibrate the scale
+    factor for a population. The nights are convolved once with the unscaled kernel, and the scores for each scale
+    factor are taken by scaling the result, so a score may differ from the one of ColeKripke.predict by rounding
+    error, which only matters for scores within rounding error of the 0.5 threshold.
+
+    :param activity: 2d array of epoch level activity index values (nights x epochs)
+    :param scale_factors: 1d array of scale factors
+    :return: 3d array of rescored predictions (scale factors x nights x epochs)
+    """
+    activity = np.atleast_2d(np.asarray(activity, dtype=np.float64))
+    scale_factors = np.atleast_1d(np.asarray(scale_factors, dtype=np.float64))
+    base = _convolve_nights(activity, CK_WEIGHTS)
+    scores = _threshold(scale_factors[:, None, None] * base[None, :, :])
+    rescored = webster_rescore(scores.reshape(-1, activity.shape[1]))
+    return rescored.reshape(scores.shape)
+
+
+class OnlineColeKripke:
+    """
+    Runs sleep wake detection on a live feed of epoch level activity data, one epoch at a time, e.g. while a night is
+    still being recorded. The Cole-Kripke kernel reaches 4 epochs ahead, and Webster's rule d looks 10 epochs past the
+    end of the sleep bouts of up to 6 epochs it rescores, so the label of an epoch is final, and emitted, LATENCY
+    epochs after it is received. Only the epochs still needed by the rules are kept. Once flushed, the labels are
+    identical to those of ColeKripke.predict on the whole series (of at least as many epochs as the kernel has
+    weights, ColeKripke.predict returning as many labels as weights for shorter series).
+    """
+
+    LATENCY = 20  # number of epochs received after an epoch before its label is emitted
+
+    def __init__(self, sf=DEFAULT_SF):
+        """
+        Initialization of the class
+
+        :param sf: scale factor to use for the predictions (see ColeKripke.predict)
+        """
+        self.sf = sf
+        self.kernel = sf * CK_WEIGHTS
+        self.received = 0  # number of epochs received
+        self.emitted = 0  # number of labels emitted
+        self._activity = []  # activity of the last epochs spanned by the kernel
+        self._epochs = deque()  # keys of the epochs not emitted yet
+        self._labels = []  # labels of the epochs from self._first on
+        self._first = 0
+        # state of rules a through c
+        self._wake_bin = 0
+        self._pending = 0
+        # state of rule d
+        self._step = 10
+        self._sleep_bin = 0
+        self._start = 0
+
+    def update(self, activity_index, epoch=None):
+        """
+        Receives the activity index of the next epoch.
+
+        :param activity_index: activity index value of the epoch
+        :param epoch: key of the epoch returned with its label, e.g. its time stamp (default its number, starting at 0)
+        :return: list of (epoch, label) of the epochs whose label became final, 1 for wake and 0 for sleep
+        """
+        self._epochs.append(self.received if epoch is None else epoch)
+        self._activity.append(float(activity_index))
+        self.received += 1
+
+        # score every epoch once the kernel spans the epochs after it, with the same products as np.convolve(..., "same")
+        n = len(self.kernel)
+        if self.received == n:
+            self._score(np.convolve(self._activity, self.kernel, "same")[: n // 2 + 1])
+        elif self.received > n:
+            del self._activity[0]
+            self._score(np.convolve(self._activity, self.kernel, "valid"))
+        self._rule_d()
+        return self._emit(self.received - self.LATENCY)
+
+    def flush(self):
+        """
+        Ends the night, labelling the epochs not emitted yet as if the last epoch received was the last of the series,
+        and resets the scorer for the next night.
+
+        :return: list of (epoch, label) of the remaining epochs
+        """
+        if self.received == 0:
+            return []
+        n = len(self.kernel)
+        if self.received < n:
+            # a series shorter than the kernel, scored with the kernel centred on every epoch
+            self._score(np.convolve(self._activity, self.kernel, "full")[n // 2 : n // 2 + self.received])
+        else:
+            self._score(np.convolve(self._activity, self.kernel, "same")[n // 2 + 1 :])
+        self._rule_d()
+        labels = self._emit(self.received)
+        self.__init__(self.sf)
+        return labels
+
+    def _score(self, scores):
+        """
+        Turns scores into predictions and applies Webster's rules a through c, which only carry forward.
+
+        :param scores: array of scores of the next epochs
+        """
+        for label in scores:
+            if label >= 0.5:
+                label = 1.0
+            elif label < 0.5:
+                label = 0.0
+            if self._pending > 0:
+                label = 1.0
+                self._pending -= 1
+            if label == 1:
+                self._wake_bin += 1
+            else:
+                if 14 < self._wake_bin:
+                    fill = 4
+                elif 9 < self._wake_bin < 15:
+                    fill = 3
+                elif 3 < self._wake_bin < 10:
+                    fill = 1
+                else:
+                    fill = 0
+                if fill > 0:
+                    label = 1.0
+                    self._pending = fill - 1
+                self._wake_bin = 0
+            self._labels.append(label)
+
+    def _rule_d(self):
+        """
+        Applies Webster's rule d to the epochs followed by at least 10 predictions, rescoring sleep bouts of up to 6
+        epochs preceded and followed by 10 wake epochs.
+        """
+        labels, first = self._labels, self._first
+        while self._step <= first + len(labels) - 11:
+            t = self._step - first
+            if labels[t] == 0:
+                self._sleep_bin += 1
+                if self._sleep_bin == 1:
+                    self._start = self._step
+            else:
+                if 0 < self._sleep_bin <= 6:
+                    s = self._start - first
+                    if sum(labels[s - 10 : s]) == 10.0 and sum(labels[t : t + 10]) == 10.0:
+                        labels[s:t] = [1.0] * (t - s)
+                self._sleep_bin = 0
+            self._step += 1
+
+    def _emit(self, stop):
+        """
+        Emits the labels of the epochs before an epoch number, and drops the labels no longer needed by rule d.
+
+        :param stop: epoch number
+        :return: list of (epoch, label)
+        """
+        labels = []
+        while self.emitted < stop:
+            labels.append((self._epochs.popleft(), self._labels[self.emitted - self._first]))
+            self.emitted += 1
+        keep = min(self.emitted, self._step - 16)
+        if keep > self._first:
+            del self._labels[: keep - self._first]
+            self._first = keep
+        return labels
@@ -1,26 +1,45 @@
 import pandas as pd
 import os
 import numpy as np
-import matplotlib
-
-try:
-    matplotlib.use("Agg")
-except Exception as e:
-    print("Error: could not use Agg as backend")
-    pass
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import seaborn as sns
-import struct
-from bitstring import BitArray
-from scipy import signal
 from shutil import copy, rmtree
-import datetime
+import copy as _copy
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 import tzlocal, pytz
-
-sns.set()
-pd.options.mode.chained_assignment = None
-__all__ = ["SleepPy", "ColeKripke", "band_pass_filter", "activity_index", "bin2df"]
+from sleeppy.geneactiv import BinReader, read_bin, csv_time_range, csv_offset, iter_csv, iter_csv_arrow
+from sleeppy.rolling import strided_std, strided_range, rolling_median
+from sleeppy.runs import run_lengths, fill_runs, inner_runs, longest_run
+from sleeppy.scoring import CK_WEIGHTS, webster_rescore
+from sleeppy.filters import FILTER_FORMS, FILTER_MODES, band_pass_design, ringing_length, zero_phase_filter
+from sleeppy.store import open_store
+from sleeppy.cache import StageCache, fingerprint, code_version, stage_key
+from sleeppy.incremental import DayManifest, digest_range
+from sleeppy.endpoints import recording_nights, night_endpoints
+from sleeppy.instrument import Instrument, measure
+from sleeppy.reports import PLOT_SERIES, plot_day, plot_summary, render_reports
+
+
+# types of the raw signals, light, features and predictions kept in the intermediate data for every precision, None
+# keeps the type the data is computed or read in
+PRECISIONS = {
+    "float64": {"signal": None, "light": None, "feature": None, "prediction": None},
+    "float32": {
+        "signal": np.float32,
+        "light": np.int16,
+        "feature": np.float32,
+        "prediction": np.int8,
+    },
+}
+__all__ = [
+    "SleepPy",
+    "ColeKripke",
+    "band_pass_filter",
+    "activity_index",
+    "activity_index_windows",
+    "bin2df",
+    "read_major_rest_periods",
+]
+MRP_COLUMNS = ["start", "end", "available_hours"]
 
 
 class SleepPy:
@@ -85,6 +104,18 @@ class SleepPy:
         clear_intermediate_data=False,
         aws_object=None,
         verbose=False,
+        streaming=False,
+        storage="hdf5",
+        workers=1,
+        cache=False,
+        instrument=False,
+        instrument_callback=None,
+        lazy_reports=False,
+        csv_reader="pandas",
+        precision="float64",
+        incremental=False,
+        filter_form="ba",
+        filter_mode="window",
     ):
         """
         Class initialization.
@@ -106,6 +137,42 @@ class SleepPy:
         :param clear_intermediate_data: boolean flag to clear all intermediate data
         :param aws_object: data object to be processed from aws (in place of source file path
         :param verbose: boolean for printing status
+        :param streaming: boolean flag to split the recording into days while reading it in chunks, holding about one
+        day of samples in memory instead of the whole recording
+        :param storage: backend for the intermediate data of every stage, "hdf5" (per-day .h5 files), "arrow"
+        (memory-mapped Arrow IPC files, one dataset per stage partitioned by day), "parquet" or "memory" (no
+        intermediate files, the data stays available in self.store and can be saved with self.store.copy_to())
+        :param workers: number of processes to run the per-day work of every stage in, days are processed serially if
+        1 (default)
+        :param cache: skip the stages whose input file, parameters and code have not changed since they last ran,
+        False (default), "mtime" (identify the input file by its size and modification time, same as True) or
+        "content" (identify the input file by a digest of its contents)
+        :param instrument: boolean flag to measure wall time, cpu time, peak memory, rows and bytes read and written of
+        every stage and day, saved as results/run_report.json and results/run_report.csv
+        :param instrument_callback: function called with every measurement record as it is completed (turns on
+        instrument)
+        :param lazy_reports: boolean flag to save the 1 minute series the visual reports are plotted from instead of
+        rendering the reports, which can be rendered later with render_reports()
+        :param csv_reader: reader of .csv recordings, "pandas" (default) or "arrow" (streaming, multithreaded pyarrow CSV
+        reader, its batches are split into days as they are read)
+        :param precision: types of the intermediate data, "float64" (default) or "float32" (float32 signals, features
+        and arm angles, int16 light and int8 predictions, which halves the memory and disk used by every stage).
+        Computations that accumulate over many samples still run in float64. On recordings checked against float64,
+        the activity index and arm angle agree to within 2e-5 (relative) and the predictions and endpoints are
+        identical, although a prediction can still flip for an epoch right at a threshold. Light values decoded from
+        .bin recordings are rounded to whole lux
+        :param incremental: boolean flag to process only the days that are new or changed since the previous run on the
+        same recording, e.g. a new download of an ongoing recording with more data appended. The days finalized by the
+        previous run (all but its last day) are kept if the parameters and their recorded data are unchanged, the rest
+        of the recording is split again from the noon of the previous last day, and the rows of the processed days are
+        appended to the major rest period, endpoint and report tables. Needs the source to be a file path, storage on
+        disk, run_config 0, and cache and clear_intermediate_data off
+        :param filter_form: form of the band-pass filter of the activity index, "ba" (numerator and denominator with
+        filtfilt, default) or "sos" (second-order sections with sosfiltfilt, numerically stabler)
+        :param filter_mode: how the band-pass filter of the activity index is applied, "window" (every 60 s window on
+        its own, default) or "continuous" (the continuous signal, in overlapping hour long chunks, without transients at
+        the window edges). The activity index differs between the modes, so predictions near the sleep/wake threshold
+        can differ too
         """
         if aws_object is not None:
             self.src = aws_object
@@ -137,6 +204,50 @@ class SleepPy:
         self.minimum_hours = minimum_hours
         self.clear = clear_intermediate_data
         self.verbose = verbose
+        self.streaming = streaming
+        self.storage = storage
+        self.workers = workers
+        self.store = open_store(storage, self.sub_dst, self.src_name)
+        self.endpoints = None
+        self.cache = cache
+        self.stage_cache = None
+        self.lazy_reports = lazy_reports
+        if csv_reader not in ("pandas", "arrow"):
+            raise ValueError("unknown csv_reader '{}'".format(csv_reader))
+        self.csv_reader = csv_reader
+        if precision not in PRECISIONS:
+            raise ValueError("unknown precision '{}'".format(precision))
+        self.precision = precision
+        self.dtypes = PRECISIONS[precision]
+        self.incremental = incremental
+        if filter_form not in FILTER_FORMS:
+            raise ValueError("unknown filter_form '{}'".format(filter_form))
+        self.filter_form = filter_form
+        if filter_mode not in FILTER_MODES:
+            raise ValueError("unknown filter_mode '{}'".format(filter_mode))
+        self.filter_mode = filter_mode
+        self.first_day = 1  # first day to process, the days before it are finalized in incremental mode
+        self.last_day = None
+        self.resume_time = None  # noon the recording is split from in incremental mode, None for its start
+        self.day_noons = {}  # noon every day saved by this run starts at
+        self.instrument = None
+        if instrument or instrument_callback is not None:
+            self.instrument = Instrument(instrument_callback)
+        if storage == "memory" and (run_config > 0 or cache):
+            raise ValueError(
+                "storage='memory' holds no intermediate data to resume from, run_config must be 0 and cache False"
+            )
+        if incremental and (
+            not isinstance(self.src, str)
+            or storage == "memory"
+            or run_config > 0
+            or cache
+            or clear_intermediate_data
+        ):
+            raise ValueError(
+                "incremental needs the source to be a file path, storage on disk, run_config 0, and cache and "
+                "clear_intermediate_data False"
+            )
         self.run()  # run the package
 
     def run(self):
@@ -144,69 +255,288 @@ class SleepPy:
         Runs the full package on the provided file.
 
         """
-        try:
-            os.mkdir(self.sub_dst)  # set up output directory
-        except OSError:
-            pass
-        if self.run_config <= 0:
-            # split the data into 24 hour periods
-            if self.verbose:
-                print("Loading data...")
-            if ".bin" in self.src:
-                self.split_days_geneactiv_bin()
-            elif ".csv" in self.src:
-                self.split_days_geneactiv_csv()
-        if self.run_config <= 1:
-            # extract the activity index feature
-            if self.verbose:
-                print("Extracting activity index...")
-            self.extract_activity_index()
-        if self.run_config <= 2:
-            # run wear/on-body detection
-            if self.verbose:
-                print("Running off-body detection...")
-            self.wear_detection()
-        if self.run_config <= 3:
-            # run major rest period detection
-            if self.verbose:
-                print("Detecting major rest period...")
-            self.major_rest_period()
-        if self.run_config <= 4:
-            # run sleep wake predictions on the major rest period
-            if self.verbose:
-                print("Running sleep/wake predictions...")
-            self.sleep_wake_predict()
-        if self.run_config <= 5:
-            # calculate endpoints based on the above predictions
-            if self.verbose:
-                print("Calculating endpoints...")
-            self.calculate_endpoints()
-        if self.run_config <= 6:
-            # generates visual reports
+        with self._measure("run"):
+            try:
+                os.mkdir(self.sub_dst)  # set up output directory
+            except OSError:
+                pass
+            if self.cache:
+                self.stage_cache = StageCache(self.sub_dst + "/stage_cache.json")
+                self.stage_keys = self.get_stage_keys()
+            if self.incremental:
+                # find the days finalized by the previous run
+                self.manifest = DayManifest(self.sub_dst + "/day_manifest.json")
+                self.first_day, self.resume_time = self.manifest.resume(
+                    self.get_stage_keys(source="")["reports"], self._source_digest
+                )
+                if self.verbose and self.first_day > 1:
+                    print("Resuming at day {}...".format(self.first_day))
+            if self.run_config <= 0 and self._stale("split"):
+                # split the data into 24 hour periods
+                if self.verbose:
+                    print("Loading data...")
+                with self._measure("split"):
+                    self.split_days()
+                self._cached("split")
+            if self.run_config <= 1 and self._stale("activity_index"):
+                # extract the activity index feature
+                if self.verbose:
+                    print("Extracting activity index...")
+                with self._measure("activity_index"):
+                    self.extract_activity_index()
+                self._cached("activity_index")
+            if self.run_config <= 2 and self._stale("wear"):
+                # run wear/on-body detection
+                if self.verbose:
+                    print("Running off-body detection...")
+                with self._measure("wear"):
+                    self.wear_detection()
+                self._cached("wear")
+            if self.run_config <= 3 and self._stale("major_rest_period"):
+                # run major rest period detection
+                if self.verbose:
+                    print("Detecting major rest period...")
+                with self._measure("major_rest_period"):
+                    self.major_rest_period()
+                self._cached("major_rest_period")
+            if self.run_config <= 4 and self._stale("sleep_wake"):
+                # run sleep wake predictions on the major rest period
+                if self.verbose:
+                    print("Running sleep/wake predictions...")
+                with self._measure("sleep_wake"):
+                    self.sleep_wake_predict()
+                self._cached("sleep_wake")
+            if self.run_config <= 5 and self._stale("endpoints"):
+                # calculate endpoints based on the above predictions
+                if self.verbose:
+                    print("Calculating endpoints...")
+                with self._measure("endpoints"):
+                    self.calculate_endpoints()
+                self._cached("endpoints")
+            if self.run_config <= 6 and self._stale("reports"):
+                # generates visual reports
+                if self.verbose:
+                    print("Generating visual reports...")
+                with self._measure("reports"):
+                    self.visualize_results()
+                self._cached("reports")
+            if self.incremental:
+                self._update_manifest()
+
+            # aggregate results
             if self.verbose:
-                print("Generating visual reports...")
-            self.visualize_results()
+                print("Aggregating results...")
+            with self._measure("aggregate"):
+                self.aggregate_results()
+
+            # clear data
+            if self.clear:
+                if self.verbose:
+                    print("Clearing intermediate data...")
+                with self._measure("clear"):
+                    self.clear_data()
+
+        # save the run report
+        if self.instrument is not None:
+            self.instrument.save(self.sub_dst + "/results/run_report")
+
+    def _measure(self, stage):
+        """
+        Measures a stage if instrumentation is on.
 
-        # aggregate results
-        if self.verbose:
-            print("Aggregating results...")
-        self.aggregate_results()
+        :param stage: name of the stage
+        :return: context manager
+        """
+        if self.instrument is None:
+            return nullcontext()
+        return self.instrument.stage(stage)
 
-        # clear data
-        if self.clear:
+    def get_stage_keys(self, source=None):
+        """
+        Keys of the inputs of every stage: the input file, the parameters of the stage and the code version, chained
+        with the keys of the stages it depends on.
+
+        :param source: key of the input file (default a fingerprint of the file)
+        :return: dictionary of stage name to key
+        """
+        if source is None:
+            if not isinstance(self.src, str):
+                raise ValueError("cache needs the source to be a file path")
+            source = fingerprint(self.src, content=self.cache == "content")
+        keys = {}
+        keys["split"] = stage_key(
+            source,
+            code_version(),
+            self.storage,
+            self.fs,
+            self.start_buffer,
+            self.stop_buffer,
+            self.start_time,
+            self.stop_time,
+            self.minimum_hours,
+            self.precision,
+        )
+        keys["activity_index"] = stage_key(
+            keys["split"], self.window_size, self.band_pass_cutoff, self.filter_form, self.filter_mode
+        )
+        keys["wear"] = stage_key(keys["split"])
+        keys["major_rest_period"] = stage_key(
+            keys["split"],
+            self.min_t,
+            self.minimum_rest_block,
+            self.allowed_rest_break,
+            self.minimum_rest_threshold,
+            self.maximum_rest_threshold,
+        )
+        keys["sleep_wake"] = stage_key(keys["activity_index"])
+        keys["endpoints"] = stage_key(keys["sleep_wake"], keys["major_rest_period"])
+        keys["reports"] = stage_key(
+            keys["endpoints"],
+            keys["wear"],
+            keys["activity_index"],
+            keys["split"],
+            self.lazy_reports,
+        )
+        return keys
+
+    def _stale(self, stage):
+        """
+        Checks whether a stage has to run, i.e. caching is off, or its inputs changed, or its outputs are missing. A
+        stage that has to run is removed from the cache until it completes.
+
+        :param stage: name of the stage
+        :return: boolean
+        """
+        if self.stage_cache is None:
+            return True
+        if self.stage_cache.is_fresh(stage, self.stage_keys[stage]) and self._has_outputs(stage):
             if self.verbose:
-                print("Clearing intermediate data...")
-            self.clear_data()
+                print("Skipping stage '{}', up to date".format(stage))
+            return False
+        self.stage_cache.invalidate(stage)
+        return True
+
+    def _cached(self, stage):
+        """
+        Records a completed stage in the cache.
+
+        :param stage: name of the stage
+        """
+        if self.stage_cache is not None:
+            self.stage_cache.update(stage, self.stage_keys[stage])
+
+    def _has_outputs(self, stage):
+        """
+        Checks whether the outputs of a stage are present.
+
+        :param stage: name of the stage
+        :return: boolean
+        """
+        mrp_csv = "/major_rest_period/{}_major_rest_periods.csv".format(self.src_name)
+        outputs = {
+            "split": lambda: self.store.days("raw"),
+            "activity_index": lambda: self.store.days("activity_index"),
+            "wear": lambda: self.store.days("wear_rescored"),
+            "major_rest_period": lambda: self.store.days("rest_periods")
+            and os.path.exists(self.sub_dst + mrp_csv),
+            "sleep_wake": lambda: self.store.days("sleep_wake"),
+            "endpoints": lambda: os.path.exists(
+                self.sub_dst + "/sleep_endpoints/sleep_endpoints_summary.csv"
+            ),
+            "reports": lambda: os.path.exists(
+                self.sub_dst
+                + ("/reports/plot_series.csv" if self.lazy_reports else "/reports/Summary_Report.pdf")
+            ),
+        }
+        return bool(outputs[stage]())
+
+    def _days(self, family):
+        """
+        Days of a family of data to process: every saved day, or in incremental mode the days from the first new or
+        changed day.
+
+        :param family: name of the family of data
+        :return: sorted list of day numbers
+        """
+        days = self.store.days(family)
+        if self.incremental:
+            days = [day for day in days if self.first_day <= day <= self.last_day]
+        return days
+
+    def _data_offset(self, time=None):
+        """
+        Byte offset of the recorded data in the source recording, or of the end of the data recorded before a time
+        stamp.
+
+        :param time: time stamp (None for the start of the recorded data)
+        :return: byte offset
+        """
+        if ".bin" in self.src:
+            with BinReader(self.src) as reader:
+                return reader.data_offset if time is None else reader.data_end(time)
+        return csv_offset(self.src, time)
+
+    def _source_digest(self, length):
+        """
+        Digest of the first bytes of the recorded data in the source recording.
+
+        :param length: number of bytes
+        :return: hex digest
+        """
+        return digest_range(self.src, self._data_offset(), length)
+
+    def _update_manifest(self):
+        """
+        Records the days of an incremental run, with the digest of the data recorded before the last day, which is
+        processed again by the next run.
+        """
+        days = {day: noon for day, noon in self.manifest.days.items() if day < self.first_day}
+        days.update(self.day_noons)
+        if not days:
+            return
+        start = self._data_offset()
+        length = self._data_offset(days[max(days)]) - start
+        self.manifest.update(
+            self.get_stage_keys(source="")["reports"],
+            days,
+            length,
+            digest_range(self.src, start, length),
+        )
+
+    def _keep_final_days(self, table, path, read):
+        """
+        Puts the rows of the days finalized by the previous run in front of the rows of the days processed by an
+        incremental run. The saved rows are cast to the types of the processed ones, so that they are written back as
+        a full run writes them in the configured precision.
+
+        :param table: pandas dataframe of the processed days, with a day index level
+        :param path: path of the table saved by the previous run
+        :param read: function reading the saved table, with the same index as table
+        :return: pandas dataframe of every day
+        """
+        if not self.incremental or self.first_day == 1:
+            return table
+        saved = read(path)
+        saved = saved[saved.index.get_level_values("day") < self.first_day]
+        return pd.concat([saved.astype(table.dtypes.to_dict()), table])
+
+    def split_days(self):
+        """
+        Splits the source recording into 24 hour chunks, with the splitter matching its format.
+
+        """
+        if self.streaming or self.incremental or (".csv" in self.src and self.csv_reader == "arrow"):
+            self.split_days_streaming()
+        elif ".bin" in self.src:
+            self.split_days_geneactiv_bin()
+        elif ".csv" in self.src:
+            self.split_days_geneactiv_csv()
 
     def split_days_geneactiv_csv(self):
         """
         Splits the GeneActiv accelerometer data into 24 hour chunks, defined from noon to noon.
 
         """
-        try:
-            os.mkdir(self.sub_dst + "/raw_days")  # set up output directory
-        except OSError:
-            pass
         # load data and fix time_stamps
         data = pd.read_csv(
             self.src,
@@ -217,12 +547,12 @@ class SleepPy:
             usecols=["Time", "X", "Y", "Z", "LUX", "T"],
             dtype={
                 "Time": object,
-                "X": np.float64,
-                "Y": np.float64,
-                "Z": np.float64,
-                "LUX": np.int64,
+                "X": self._dtype("signal", np.float64),
+                "Y": self._dtype("signal", np.float64),
+                "Z": self._dtype("signal", np.float64),
+                "LUX": self._dtype("light", np.int64),
                 "Button": bool,
-                "T": np.float64,
+                "T": self._dtype("signal", np.float64),
             },
             low_memory=False,
         )
@@ -256,20 +586,13 @@ class SleepPy:
             data = data.loc[: self.stop_time]
 
         # split data into days from noon to noon
-        days = data.groupby(pd.Grouper(level=0, freq="24h", base=12))
+        days = data.groupby((data.index - pd.Timedelta("12h")).floor("D"))
 
         # iterate through days keeping track of the day
         count = 0
         for day in days:
             # save each 24 hour day separately if there's enough data to analyze
-            df = day[1].copy()
-            available_hours = (len(df) / float(self.fs)) / 3600.0
-            if available_hours >= self.minimum_hours:
-                count += 1
-                dst = "/raw_days/{}_day_{}.h5".format(
-                    self.src_name, str(count).zfill(2)
-                )
-                df.to_hdf(self.sub_dst + dst, key="raw_geneactiv_data_24hr", mode="w")
+            count = self._save_day(day[1].copy(), count)
         return
 
     def split_days_geneactiv_bin(self):
@@ -277,119 +600,184 @@ class SleepPy:
         Splits the GeneActiv accelerometer data into 24 hour chunks, defined from noon to noon.
 
         """
-        try:
-            os.mkdir(self.sub_dst + "/raw_days")  # set up output directory
-        except OSError:
-            pass
-        # load data and fix time_stamps
-        data = bin2df(self.src)
-
-        # remove any specified time periods from the beginning and end of the file
-        data = data.loc[
-            data.index[0]
-            + pd.Timedelta(self.start_buffer) : data.index[-1]
-            - pd.Timedelta(self.stop_buffer)
-        ]
-
-        # cut to defined start and end times if specified
-        if self.start_time and self.stop_time:
-            self.start_time = pd.to_datetime(
-                self.start_time, format="%Y-%m-%d %H:%M:%S:%f"
-            )
-            self.stop_time = pd.to_datetime(
-                self.stop_time, format="%Y-%m-%d %H:%M:%S:%f"
-            )
-            data = data.loc[self.start_time : self.stop_time]
-        elif self.start_time:
-            self.start_time = pd.to_datetime(
-                self.start_time, format="%Y-%m-%d %H:%M:%S:%f"
-            )
-            data = data.loc[self.start_time :]
-        elif self.stop_time:
-            self.stop_time = pd.to_datetime(
-                self.stop_time, format="%Y-%m-%d %H:%M:%S:%f"
-            )
-            data = data.loc[: self.stop_time]
+        # index the pages of the file and decode only the ones inside the requested time range
+        with BinReader(self.src, *self._bin_dtypes()) as reader:
+            start = reader.start + pd.Timedelta(self.start_buffer)
+            stop = reader.stop - pd.Timedelta(self.stop_buffer)
+            if self.start_time:
+                start = max(
+                    start,
+                    pd.to_datetime(self.start_time, format="%Y-%m-%d %H:%M:%S:%f"),
+                )
+            if self.stop_time:
+                stop = min(
+                    stop, pd.to_datetime(self.stop_time, format="%Y-%m-%d %H:%M:%S:%f")
+                )
+            data = reader.read(start, stop)
 
         # split data into days from noon to noon
-        days = data.groupby(pd.Grouper(level=0, freq="24h", base=12))
+        days = data.groupby((data.index - pd.Timedelta("12h")).floor("D"))
 
         # iterate through days keeping track of the day
         count = 0
         for day in days:
             # save each 24 hour day separately if there's enough data to analyze
-            df = day[1].copy()
-            available_hours = (len(df) / float(self.fs)) / 3600.0
-            if available_hours >= self.minimum_hours:
-                count += 1
-                dst = "/raw_days/{}_day_{}.h5".format(
-                    self.src_name, str(count).zfill(2)
-                )
-                df.to_hdf(self.sub_dst + dst, key="raw_geneactiv_data_24hr", mode="w")
+            count = self._save_day(day[1].copy(), count)
         return
 
+    def split_days_streaming(self):
+        """
+        Splits the GeneActiv accelerometer data into 24 hour chunks, defined from noon to noon. The recording is read in
+        chunks and every finished day is saved as soon as the first sample of the next day is seen, so that at most one
+        day of samples is held in memory.
+
+        """
+        reader = None
+        if ".bin" in self.src:
+            reader = BinReader(self.src, *self._bin_dtypes())
+            first, last = reader.start, reader.stop
+        elif ".csv" in self.src:
+            first, last = csv_time_range(self.src)
+
+        # remove any specified time periods from the beginning and end of the file
+        start = first + pd.Timedelta(self.start_buffer)
+        stop = last - pd.Timedelta(self.stop_buffer)
+
+        # cut to defined start and end times if specified
+        if self.start_time:
+            start = max(
+                start, pd.to_datetime(self.start_time, format="%Y-%m-%d %H:%M:%S:%f")
+            )
+        if self.stop_time:
+            stop = min(
+                stop, pd.to_datetime(self.stop_time, format="%Y-%m-%d %H:%M:%S:%f")
+            )
+
+        # in incremental mode, skip the days finalized by the previous run
+        offset = None
+        if self.resume_time is not None:
+            start = max(start, self.resume_time)
+            if reader is None:
+                offset = csv_offset(self.src, start)
+
+        if reader is not None:
+            chunks = reader.iter_read(start, stop)
+        elif self.csv_reader == "arrow":
+            chunks = iter_csv_arrow(self.src, *self._csv_dtypes(), offset=offset)
+            chunks = (chunk.loc[start:stop] for chunk in chunks)
+        else:
+            chunks = iter_csv(self.src, 1000000, *self._csv_dtypes(), offset=offset)
+            chunks = (chunk.loc[start:stop] for chunk in chunks)
+
+        # route the samples of every chunk to their noon to noon day
+        count = self.first_day - 1
+        current, buffer = None, []
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            keys = (chunk.index - pd.Timedelta("12h")).floor("D")
+            starts = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1]
+            stops = np.r_[starts[1:], len(chunk)]
+            for a, b in zip(starts, stops):
+                if keys[a] != current and buffer:
+                    count = self._save_day(pd.concat(buffer), count)
+                    buffer = []
+                current = keys[a]
+                buffer.append(chunk.iloc[a:b])
+        if buffer:
+            count = self._save_day(pd.concat(buffer), count)
+        if reader is not None:
+            reader.close()
+        self.last_day = count
+
+    def _save_day(self, df, count):
+        """
+        Saves a 24 hour day if there's enough data to analyze.
+
+        :param df: pandas dataframe housing the samples of the day
+        :param count: number of days saved so far
+        :return: updated number of days saved
+        """
+        available_hours = (len(df) / float(self.fs)) / 3600.0
+        if available_hours >= self.minimum_hours:
+            count += 1
+            self.day_noons[count] = (df.index[0] - pd.Timedelta("12h")).floor("D") + pd.Timedelta("12h")
+            self.store.write("raw", count, df)
+            minutes = df.resample("60s").median()
+            self.store.write("raw_minutes", count, self._cast(minutes, "signal"))
+            if self.instrument is not None:
+                self.instrument.count_rows(len(df))
+        return count
+
+    def _dtype(self, kind, default):
+        """
+        Type of a kind of data in the configured precision.
+
+        :param kind: "signal", "light", "feature" or "prediction"
+        :param default: type used if the precision keeps the computed type
+        :return: numpy type
+        """
+        dtype = self.dtypes[kind]
+        return default if dtype is None else dtype
+
+    def _bin_dtypes(self):
+        """
+        Types of the signals and the light decoded from .bin recordings.
+        """
+        return self._dtype("signal", np.float64), self._dtype("light", np.float64)
+
+    def _csv_dtypes(self):
+        """
+        Types of the signals and the light read from .csv recordings.
+        """
+        return self._dtype("signal", np.float64), self._dtype("light", np.int64)
+
+    def _cast(self, data, kind):
+        """
+        Casts data to the type of its kind in the configured precision.
+
+        :param data: numpy array or pandas object
+        :param kind: "signal", "light", "feature" or "prediction"
+        :return: data in the configured type (the same object if the precision keeps the computed type)
+        """
+        if self.dtypes[kind] is None:
+            return data
+        return data.astype(self.dtypes[kind])
+
     def extract_activity_index(self):
         """
         Calculates the activity index feature on each 24 hour day.
 
         """
-        try:
-            os.mkdir(self.sub_dst + "/activity_index_days")  # set up output directory
-        except OSError:
-            pass
-        count = 0
+        self._map_days("_activity_index_day", self._days("raw"))
 
-        # get days
-        days = sorted(
-            [
-                self.sub_dst + "/raw_days/" + i
-                for i in os.listdir(self.sub_dst + "/raw_days/")
-                if ".DS_Store" not in i
-            ]
-        )
-        for day in days:
-            count += 1
+    def _activity_index_day(self, day):
+        """
+        Calculates the activity index feature of one day.
 
-            # load data
-            df = pd.read_hdf(day)
-            activity = []
-            header = ["Time", "activity_index"]
-            idx = 0
-            window = int(self.window_size * self.fs)
-            incrementer = int(self.window_size * self.fs)
-
-            # iterate through windows
-            while idx < len(df) - incrementer:
-                # preprocessing: BP Filter
-                temp = df[["X", "Y", "Z"]].iloc[idx : idx + window]
-                start_time = temp.index[0]
-                temp.index = range(len(temp.index))  # reset index
-                temp = band_pass_filter(
-                    temp, self.fs, bp_cutoff=self.band_pass_cutoff, order=3
-                )
+        :param day: day number
+        :return: list of (family, data) to save, and None
+        """
+        # load data
+        df = self.store.read("raw", day, columns=["X", "Y", "Z"])
+        window = int(self.window_size * self.fs)
+
+        # band pass filter every window and extract the activity index
+        ai = activity_index_windows(
+            df[["X", "Y", "Z"]].values,
+            self.fs,
+            window,
+            bp_cutoff=self.band_pass_cutoff,
+            order=3,
+            form=self.filter_form,
+            mode=self.filter_mode,
+        )
+        activity = pd.DataFrame(
+            {"activity_index": self._cast(ai, "feature")},
+            index=pd.DatetimeIndex(df.index[: len(ai) * window : window], name="Time"),
+        )
 
-                # activity index extraction
-                bp_channels = [
-                    i for i in temp.columns.values[1:] if "bp" in i
-                ]  # band pass filtered channels
-                activity.append(
-                    [
-                        start_time,
-                        activity_index(temp, channels=bp_channels).values[0][0],
-                    ]
-                )
-                idx += incrementer
-
-            # save data
-            activity = pd.DataFrame(activity)
-            activity.columns = header
-            activity.set_index("Time", inplace=True)
-            dst = "/activity_index_days/{}_activity_index_day_{}.h5".format(
-                self.src_name, str(count).zfill(2)
-            )
-            activity.to_hdf(
-                self.sub_dst + dst, key="activity_index_data_24hr", mode="w"
-            )
+        return [("activity_index", activity)], None
 
     def wear_detection(self):
         """
@@ -397,69 +785,50 @@ class SleepPy:
         rescored predictions.
 
         """
-        try:
-            os.mkdir(self.sub_dst + "/wear_detection")  # set up output directory
-        except OSError:
-            pass
-        count = 0
-
         # get days
-        days = sorted(
-            [
-                self.sub_dst + "/raw_days/" + i
-                for i in os.listdir(self.sub_dst + "/raw_days/")
-                if ".DS_Store" not in i
-            ]
-        )
-        for day in days:
-            df = pd.read_hdf(day)[["X", "Y", "Z"]]
-            count += 1
+        days = self._days("raw")
+        self._map_days("_wear_day", days, [day == days[-1] for day in days])
 
-            # get std based classification criteria
-            df_std = self.roll_std_60_minute(df)
-            df_std[df_std >= 0.013] = 1
-            df_std[df_std < 0.013] = 0
-            df_std = df_std.sum(axis=1)
-
-            # get range based classification criteria
-            df_range = self.roll_max_range_60_minute(df)
-            df_range[df_range >= 0.15] = 1
-            df_range[df_range < 0.15] = 0
-            df_range = df_range.sum(axis=1)
-
-            # classify
-            df_wear = pd.DataFrame(df_std.copy()) * 0 + 1
-            df_wear.columns = ["wear"]
-            for i in range(len(df_wear)):
-                if df_range.iloc[i] <= 1 or df_std.iloc[i] <= 1:
-                    df_wear.iloc[i] = 0
-
-            # save before rescoring
-            df_wear.to_hdf(
-                self.sub_dst
-                + "/wear_detection/wear_detection_day_{}.h5".format(
-                    str(count).zfill(2)
-                ),
-                key="wear_detection_24hr",
-                mode="w",
-            )
-
-            # apply rescoring
-            df_wear = self.rescore(df_wear)
-            df_wear = self.rescore(df_wear)
-            df_wear = self.rescore(df_wear)
-            if count == len(days):
-                df_wear = self.rescore_last_day(df_wear)
+    def _wear_day(self, day, last_day):
+        """
+        Runs wear detection on one day.
 
-            # save post rescoring
-            df_wear.to_hdf(
-                self.sub_dst
-                + "/wear_detection/wear_detection_rescored_day_{}.h5".format(
-                    str(count).zfill(2)
-                ),
-                key="wear_detection_rescored_24hr",
-                mode="w",
-            )
+        :param day: day number
+        :param last_day: whether this is the last day of the recording, which gets further rescoring
+        :return: list of (family, data) to save, and None
+        """
+        df = self.store.read("raw", day, columns=["X", "Y", "Z"])
+
+        # get std based classification criteria
+        df_std = self.roll_std_60_minute(df)
+        df_std[df_std >= 0.013] = 1
+        df_std[df_std < 0.013] = 0
+        df_std = df_std.sum(axis=1)
+
+        # get range based classification criteria
+        df_range = self.roll_max_range_60_minute(df)
+        df_range[df_range >= 0.15] = 1
+        df_range[df_range < 0.15] = 0
+        df_range = df_range.sum(axis=1)
+
+        # classify
+        df_wear = pd.DataFrame(df_std.copy()) * 0 + 1
+        df_wear.columns = ["wear"]
+        df_wear.loc[((df_range <= 1) | (df_std <= 1)).values, "wear"] = 0
+
+        # keep before rescoring
+        outputs = [("wear", self._cast(df_wear.copy(), "prediction"))]
+
+        # apply rescoring
+        df_wear = self.rescore(df_wear)
+        df_wear = self.rescore(df_wear)
+        df_wear = self.rescore(df_wear)
+        if last_day:
+            df_wear = self.rescore_last_day(df_wear)
+
+        # keep post rescoring
+        outputs.append(("wear_rescored", self._cast(df_wear, "prediction")))
+        return outputs, None
 
     def major_rest_period(self):
         """
@@ -469,170 +838,138 @@ class SleepPy:
             os.mkdir(self.sub_dst + "/major_rest_period")  # set up output directory
         except OSError:
             pass
-        count = 0
-        mrps = []
-        header = ["day", "major_rest_period", "available_hours"]
-
-        # get days
-        days = sorted(
-            [
-                self.sub_dst + "/raw_days/" + i
-                for i in os.listdir(self.sub_dst + "/raw_days/")
-                if ".DS_Store" not in i
-            ]
-        )
-        for day in days:
-            df = pd.read_hdf(day)
-            df = df[["X", "Y", "Z", "T"]]
-            available_hours = (len(df) / float(self.fs)) / 3600.0
-            count += 1
-
-            # process data
-            df = df.rolling(int(5 * self.fs)).median()  # run rolling median 5 second
-            df["angle"] = np.arctan(
-                df["Z"] / ((df["X"] ** 2 + df["Y"] ** 2) ** 0.5)
-            ) * (
-                180.0 / np.pi
-            )  # get angle
+        mrps = self._map_days("_major_rest_period_day", self._days("raw"))
 
-            df = (
-                df[["angle", "T"]].resample("5s").mean().fillna(0)
-            )  # get 5 second average
+        # aggregate and save the major rest period for each day, as start and end time columns
+        mrps = pd.DataFrame(mrps, columns=["day"] + MRP_COLUMNS)
+        mrps.set_index("day", inplace=True)
+        dst = "/major_rest_period/{}_major_rest_periods.csv".format(self.src_name)
+        mrps = self._keep_final_days(mrps, self.sub_dst + dst, read_major_rest_periods)
+        mrps.to_csv(self.sub_dst + dst)
+        self.major_rest_periods = mrps
 
-            # save intermediate data for plotting
-            df["angle"].to_hdf(
-                self.sub_dst
-                + "/major_rest_period/5_second_average_arm_angle_day_{}.h5".format(
-                    str(count).zfill(2)
-                ),
-                key="arm_angle_data_24hr",
-                mode="w",
-            )
+    def _major_rest_period_day(self, day):
+        """
+        Determines the major rest period of one day.
 
-            df["angle"] = np.abs(
-                df["angle"] - df["angle"].shift(1)
-            )  # get absolute difference
-            df_angle = self.roll_med(df["angle"], 60)  # run rolling median 5 minute
-            df_temp = self.roll_med(df["T"], 60)  # run rolling median 5 minute
-
-            # calculate and apply threshold
-            thresh = np.min(
-                [
-                    np.max(
-                        [
-                            np.percentile(df_angle.Data.dropna().values, 10) * 15.0,
-                            self.minimum_rest_threshold,
-                        ]
-                    ),
-                    self.maximum_rest_threshold,
-                ]
-            )
-            df_angle.Data[df_angle.Data < thresh] = 0  # apply threshold
-            df_angle.Data[df_angle.Data >= thresh] = 1  # apply threshold
-
-            # drop rest periods where temperature is below the temp threshold
-            df_angle.Data[df_temp.Data <= self.min_t] = 1
-            df = df_angle
-
-            # drop rest blocks < minimum_rest_block minutes (except first and last)
-            df["block"] = (df.Data.diff().ne(0)).cumsum()
-            groups, iter_count = df.groupby(by="block"), 0
-            for group in groups:
-                iter_count += 1
-                if iter_count == 1 or iter_count == len(groups):
-                    continue
-                if (
-                    group[1]["Data"].sum() == 0
-                    and len(group[1]) < 12 * self.minimum_rest_block
-                ):
-                    df.Data[group[1].index[0] : group[1].index[-1]] = 1
-
-            # drop active blocks < allowed_rest_break minutes (except first and last)
-            df["block"] = (df.Data.diff().ne(0)).cumsum()
-            groups, iter_count = df.groupby(by="block"), 0
-            for group in groups:
-                iter_count += 1
-                if iter_count == 1 or iter_count == len(groups):
-                    continue
-                if (
-                    len(group[1]) == group[1]["Data"].sum()
-                    and len(group[1]) < 12 * self.allowed_rest_break
-                ):
-                    df.Data[group[1].index[0] : group[1].index[-1]] = 0
-
-            # get longest block
-            df["block"] = (df.Data.diff().ne(0)).cumsum()
-            best = 0
-            mrp = []
-            for group in df.groupby(by="block"):
-                if group[1]["Data"].sum() == 0 and len(group[1]) > best:
-                    best = len(group[1])
-                    mrp = [group[1].index[0], group[1].index[-1] + pd.Timedelta("5m")]
-
-            # save predictions
-            df.drop(columns=["block"], inplace=True)
-            df.to_hdf(
-                self.sub_dst
-                + "/major_rest_period/rest_periods_day_{}.h5".format(
-                    str(count).zfill(2)
+        :param day: day number
+        :return: list of (family, data) to save, and the row of the major rest period table (start and end are NaT if
+        there is no rest period)
+        """
+        df = self.store.read("raw", day, columns=["X", "Y", "Z", "T"])
+        available_hours = (len(df) / float(self.fs)) / 3600.0
+
+        # process data
+        df = df.rolling(int(5 * self.fs)).median()  # run rolling median 5 second
+        df["angle"] = np.arctan(
+            df["Z"] / ((df["X"] ** 2 + df["Y"] ** 2) ** 0.5)
+        ) * (
+            180.0 / np.pi
+        )  # get angle
+
+        df = (
+            df[["angle", "T"]].resample("5s").mean().fillna(0)
+        )  # get 5 second average
+
+        # keep intermediate data for plotting
+        outputs = [("arm_angle", self._cast(df["angle"].copy(), "feature"))]
+
+        df["angle"] = np.abs(
+            df["angle"] - df["angle"].shift(1)
+        )  # get absolute difference
+        df_angle = self.roll_med(df["angle"], 60)  # run rolling median 5 minute
+        df_temp = self.roll_med(df["T"], 60)  # run rolling median 5 minute
+
+        # calculate and apply threshold
+        thresh = np.min(
+            [
+                np.max(
+                    [
+                        np.percentile(df_angle.Data.dropna().values, 10) * 15.0,
+                        self.minimum_rest_threshold,
+                    ]
                 ),
-                key="rest_period_data_24hr",
-                mode="w",
-            )
+                self.maximum_rest_threshold,
+            ]
+        )
+        rest = df_angle["Data"].values
+        rest = np.where(
+            rest < thresh, 0.0, np.where(rest >= thresh, 1.0, rest)
+        )  # apply threshold, missing values stay missing
+
+        # drop rest periods where temperature is below the temp threshold
+        rest[df_temp["Data"].values <= self.min_t] = 1.0
+        df_angle["Data"] = rest
+        df = df_angle
+
+        # drop rest blocks < minimum_rest_block minutes (except first and last)
+        starts, lengths, values = run_lengths(df.Data.values)
+        short = (
+            inner_runs(len(values))
+            & (values == 0)
+            & (lengths < 12 * self.minimum_rest_block)
+        )
+        df["Data"] = fill_runs(values, lengths, short, 1)
+
+        # drop active blocks < allowed_rest_break minutes (except first and last)
+        starts, lengths, values = run_lengths(df.Data.values)
+        short = (
+            inner_runs(len(values))
+            & (values == 1)
+            & (lengths < 12 * self.allowed_rest_break)
+        )
+        df["Data"] = fill_runs(values, lengths, short, 0)
 
-            mrps.append([count, mrp, available_hours])
+        # get longest block
+        starts, lengths, values = run_lengths(df.Data.values)
+        best = longest_run(values, lengths, 0)
+        start, end = pd.NaT, pd.NaT
+        if best is not None:
+            start = df.index[starts[best]]
+            end = df.index[starts[best] + lengths[best] - 1] + pd.Timedelta("5m")
 
-        # aggregate and save the major rest period for each day
-        mrps = pd.DataFrame(mrps)
-        mrps.columns = header
-        mrps.set_index("day", inplace=True)
-        dst = "/major_rest_period/{}_major_rest_periods.csv".format(self.src_name)
-        mrps.to_csv(self.sub_dst + dst)
+        # keep predictions
+        outputs.append(("rest_periods", self._cast(df, "prediction")))
+        return outputs, [day, start, end, available_hours]
 
     def sleep_wake_predict(self):
         """
         Run sleep wake prediction based on the activity index feature.
         """
-        try:
-            os.mkdir(
-                self.sub_dst + "/sleep_wake_predictions"
-            )  # set up output directory
-        except OSError:
-            pass
-        count = 0
+        if self.storage == "hdf5":
+            try:
+                os.mkdir(
+                    self.sub_dst + "/sleep_wake_predictions"
+                )  # set up output directory
+            except OSError:
+                pass
+        self._map_days("_sleep_wake_day", self._days("activity_index"))
 
-        # get days
-        days = sorted(
-            [
-                self.sub_dst + "/activity_index_days/" + i
-                for i in os.listdir(self.sub_dst + "/activity_index_days/")
-                if ".DS_Store" not in i
-            ]
-        )
-        for day in days:
-            count += 1
-            df = pd.read_hdf(day)
+    def _sleep_wake_day(self, day):
+        """
+        Run sleep wake prediction on one day.
 
-            # run the sleep wake predictions
-            ck = ColeKripke(df.activity_index)
-            df["sleep_predictions"] = ck.predict()
+        :param day: day number
+        :return: list of (family, data) to save, and None
+        """
+        df = self.store.read("activity_index", day)
 
-            # save predictions
-            df.drop(inplace=True, columns=["activity_index"])
-            df.to_hdf(
-                self.sub_dst
-                + "/sleep_wake_predictions/sleep_wake_day_{}.h5".format(
-                    str(count).zfill(2)
-                ),
-                key="sleep_wake_data_24hr",
-                mode="w",
-            )
+        # run the sleep wake predictions
+        ck = ColeKripke(df.activity_index)
+        df["sleep_predictions"] = ck.predict()
+
+        # keep predictions
+        df.drop(inplace=True, columns=["activity_index"])
+        df = self._cast(df, "prediction")
+        if self.storage == "hdf5":
+            # csv copy kept alongside the hdf5 layout
             df.to_csv(
                 self.sub_dst
                 + "/sleep_wake_predictions/sleep_wake_day_{}.csv".format(
-                    str(count).zfill(2)
+                    str(day).zfill(2)
                 )
             )
+        return [("sleep_wake", df)], None
 
     def calculate_endpoints(self):
         """
@@ -642,130 +979,25 @@ class SleepPy:
             os.mkdir(self.sub_dst + "/sleep_endpoints")  # set up output directory
         except OSError:
             pass
-        count = 0
-
-        # get days
-        days = sorted(
-            [
-                self.sub_dst + "/sleep_wake_predictions/" + i
-                for i in os.listdir(self.sub_dst + "/sleep_wake_predictions/") if i.endswith(".h5")
-                if ".DS_Store" not in i
-            ]
-        )
-        
-        # get info about local timezone to localize all sleep onset timestamps
-        local_tz = tzlocal.get_localzone()
-        
-        # get major rest periods for each day
-        mrps = pd.read_csv(
-            self.sub_dst
-            + "/major_rest_period/{}_major_rest_periods.csv".format(self.src_name),
-            parse_dates=True,
-            index_col="day",
-        )
-        endpoints = []
-        for day in days:
-            count += 1
-            df = pd.read_hdf(day)
-            # get and format times
-            times = mrps.loc[count].major_rest_period
-            try:
-                idt = times.index("[T")
-                times = times[: idt + 1] + "pd." + times[idt + 1 :]
-                idt = times.index(", ")
-                times = times[: idt + 2] + "pd." + times[idt + 2 :]
-                times = eval(times)
-                df = df.loc[times[0] : times[1]]
-            except ValueError:
-                pass
-            
-            # get sleep onset time
-            sleep_onset_time = df.idxmin()[0]
-            sleep_onset_time = sleep_onset_time.replace(tzinfo=local_tz).astimezone(local_tz)
-            sleep_onset_ts = sleep_onset_time.timestamp()
-
-            # get sleep onset latency
-            sleep_onset_lat = (df.idxmin()[0] - df.index[0]).total_seconds()
-
-            # get rise time
-            rise_time = df.index[-1].replace(tzinfo=local_tz).astimezone(local_tz)
-            rise_time_ts = rise_time.timestamp()
-            
-            # get total bed time
-            total_bed_time = len(df) * 60
-            
-            # get total sleep time
-            tst = (len(df) - sum(df.values)) * 60
-            
-            # get total wake time
-            total_wake_time = total_bed_time - tst
-            
-            # get percent time asleep
-            pct_time_sleep = 100.0 * (len(df) - sum(df.values)) / float(len(df))
-
-            # get wake after sleep onset
-            waso = df.loc[df.idxmin()[0] :]
-            waso = waso.sum()[0] * 60
-            
-            # first wake after sleep
-            first_waso = (df.loc[df.idxmin()[0] :].idxmax()[0] - df.idxmin()[0]).total_seconds()
-
-            # number of wake bouts
-            num_wake_bouts = 0
-            wake_bout_df = df.copy()
-            wake_bout_df["block"] = (
-                wake_bout_df.sleep_predictions.diff().ne(0)
-            ).cumsum()
-            for group in wake_bout_df.groupby(by="block"):
-                if group[1]["sleep_predictions"].sum() > 0:
-                    num_wake_bouts += 1
-            
-            median_activ_df = wake_bout_df.groupby(by="block").agg({"sleep_predictions": "sum"})
-            num_wake_bouts = median_activ_df.loc[median_activ_df["sleep_predictions"] > 0]["sleep_predictions"].count()
-            median_wake_bout = \
-                median_activ_df.loc[median_activ_df["sleep_predictions"] > 0]["sleep_predictions"].median() * 60
-            
-            endpoints.append(
-                [
-                    int(count),
-                    datetime.datetime.strftime(sleep_onset_time, "%Y-%m-%d %H:%M:%S.%z"),
-                    int(sleep_onset_ts),
-                    datetime.datetime.strftime(rise_time, "%Y-%m-%d %H:%M:%S.%z"),
-                    int(rise_time_ts),
-                    int(total_bed_time),
-                    int(tst[0]),
-                    int(total_wake_time),
-                    int(np.round(pct_time_sleep[0])),
-                    int(waso),
-                    int(first_waso),
-                    int(sleep_onset_lat),
-                    int(num_wake_bouts),
-                    int(median_wake_bout)
-                ]
+        # get major rest periods for each day, kept in memory if they were detected in this run
+        if isinstance(self.major_rest_periods, pd.DataFrame):
+            mrps = self.major_rest_periods
+        else:
+            mrps = read_major_rest_periods(
+                self.sub_dst
+                + "/major_rest_period/{}_major_rest_periods.csv".format(self.src_name)
             )
 
-        # build and save output dataframe
-        hdr = [
-            "day",
-            "sleep_onset",
-            "sleep_onset_ts",
-            "rise",
-            "rise_ts",
-            "total_bed_time",
-            "total_sleep_time",
-            "total_wake_time",
-            "sleep_efficiency",
-            "waso",
-            "first_waso",
-            "sleep_onset_latency",
-            "num_active_periods",
-            "median_active_len"
-        ]
-        endpoints = pd.DataFrame(endpoints)
-        endpoints.columns = hdr
-        endpoints.set_index(endpoints.day, inplace=True)
-        endpoints.drop(columns="day", inplace=True)
+        # calculate the endpoints of every day at once, localizing the onset and rise times to the local timezone
+        nights = recording_nights(self.store, mrps, self.src_name, self._days("sleep_wake"))
+        endpoints = night_endpoints(nights, tzlocal.get_localzone()).loc[self.src_name]
+        endpoints = self._keep_final_days(
+            endpoints,
+            self.sub_dst + "/sleep_endpoints/sleep_endpoints_summary.csv",
+            lambda path: pd.read_csv(path, index_col="day"),
+        )
         endpoints.to_csv(self.sub_dst + "/sleep_endpoints/sleep_endpoints_summary.csv")
+        self.endpoints = endpoints
 
     def roll_med(self, df, num_samples):
         """
@@ -775,19 +1007,13 @@ class SleepPy:
         :param num_samples: number of samples to include in the window
         :return: pandas dataframe containing the rolling median values.
         """
+        # get the median of the window starting at every index
+        med = rolling_median(df.values, num_samples)
 
-        # initialize indexer and rolling median list
-        idx = 0
-        med = []
-        while idx < len(df) - num_samples:
-            med.append(
-                [df.index[idx], df.iloc[idx : idx + num_samples].median()]
-            )  # get start index, std value
-            idx += 1
         # format data frame
-        df = pd.DataFrame(med, columns=["Time", "Data"])
-        df.set_index(df.Time, inplace=True)
-        df.drop(inplace=True, columns="Time")
+        df = pd.DataFrame(
+            {"Data": med}, index=pd.Index(df.index[: len(med)].values, name="Time")
+        )
         return df
 
     def roll_std_60_minute(self, df):
@@ -797,24 +1023,15 @@ class SleepPy:
         :param df: pandas dataframe
         :return: pandas dataframe containing the rolling std values
         """
-        # initialize indexer and rolling std list
-        idx = 0
-        rstd = []
-
-        # calculate std for all windows
-        while idx < len(df) - int(900 * self.fs):  # run until we reach the end
-            xyz = (
-                df.iloc[idx : idx + int(3600 * self.fs)].std().values
-            )  # save std in x y and z
-            rstd.append(
-                [df.index[idx], xyz[0], xyz[1], xyz[2]]
-            )  # get start index of window, std values
-            idx += int(900 * self.fs)  # increment indexer by 15 minutes
+        # std of 60 minute windows starting every 15 minutes
+        starts, rstd = strided_std(
+            df[["X", "Y", "Z"]].values, int(3600 * self.fs), int(900 * self.fs)
+        )
 
         # format dataframe
-        df = pd.DataFrame(rstd, columns=["Time", "X", "Y", "Z"])
-        df.set_index(df.Time, inplace=True)
-        df.drop(inplace=True, columns="Time")
+        df = pd.DataFrame(
+            rstd, columns=["X", "Y", "Z"], index=df.index[starts].rename("Time")
+        )
         return df
 
     def roll_max_range_60_minute(self, df):
@@ -824,346 +1041,211 @@ class SleepPy:
         :param df: pandas dataframe
         :return: pandas dataframe containing the rolling std values.
         """
-        # initialize indexer and rolling range list
-        idx = 0
-        rr = []
-
-        # calculate range for all windows
-        while idx < len(df) - int(900 * self.fs):  # run until we reach the end
-            xyz = (
-                df.iloc[idx : idx + int(3600 * self.fs)].max().values
-                - df.iloc[idx : idx + int(3600 * self.fs)].min().values
-            )  # save range in x y z
-            rr.append(
-                [df.index[idx], xyz[0], xyz[1], xyz[2]]
-            )  # get start index of window, range values
-            idx += int(900 * self.fs)  # increment indexer by 15 minutes
+        # range of 60 minute windows starting every 15 minutes
+        starts, rr = strided_range(
+            df[["X", "Y", "Z"]].values, int(3600 * self.fs), int(900 * self.fs)
+        )
 
         # format dataframe
-        df = pd.DataFrame(rr, columns=["Time", "X", "Y", "Z"])
-        df.set_index(df.Time, inplace=True)
-        df.drop(inplace=True, columns="Time")
+        df = pd.DataFrame(
+            rr, columns=["X", "Y", "Z"], index=df.index[starts].rename("Time")
+        )
         return df
 
     def visualize_results(self):
         """
-        Generates reports to visualize endpoint summary and day to day endpoint behaviors.
+        Generates reports to visualize endpoint summary and day to day endpoint behaviors. With lazy_reports, only the
+        1 minute series the reports are plotted from are saved (reports/plot_series.csv), and the reports can be
+        rendered later with render_reports().
         """
         try:
             os.mkdir(self.sub_dst + "/reports")  # set up output directory
         except OSError:
             pass
-        # raw (all 3 axes, temp, light)
-        rdays = sorted(
-            [
-                self.sub_dst + "/raw_days/" + i
-                for i in os.listdir(self.sub_dst + "/raw_days/") if i.endswith(".h5")
-                if ".DS_Store" not in i
-            ]
-        )
-        # wear (no rescoring)
-        wdays = sorted(
-            [
-                self.sub_dst + "/wear_detection/" + i
-                for i in os.listdir(self.sub_dst + "/wear_detection/") if i.endswith(".h5")
-                if "rescored" not in i and ".h5" in i and ".DS_Store" not in i
-            ]
-        )
-        # wear (with rescoring)
-        wdays_re = sorted(
-            [
-                self.sub_dst + "/wear_detection/" + i
-                for i in os.listdir(self.sub_dst + "/wear_detection/") if i.endswith(".h5")
-                if "rescored" in i and ".DS_Store" not in i
-            ]
-        )
-        # major rest (arm angle)
-        mrdays_aa = sorted(
-            [
-                self.sub_dst + "/major_rest_period/" + i
-                for i in os.listdir(self.sub_dst + "/major_rest_period/") if i.endswith(".h5")
-                if "angle" in i and ".DS_Store" not in i
-            ]
-        )
-        # major rest (periods)
-        mrdays_rp = sorted(
-            [
-                self.sub_dst + "/major_rest_period/" + i
-                for i in os.listdir(self.sub_dst + "/major_rest_period/") if i.endswith(".h5")
-                if "angle" not in i and "h5" in i and ".DS_Store" not in i
-            ]
-        )
-        # activity index (full 24 hours)
-        aidays = sorted(
-            [
-                self.sub_dst + "/activity_index_days/" + i
-                for i in os.listdir(self.sub_dst + "/activity_index_days/") if i.endswith(".h5")
-                if ".DS_Store" not in i
-            ]
-        )
-        # sleep wake (full 24 hours)
-        swdays = sorted(
-            [
-                self.sub_dst + "/sleep_wake_predictions/" + i
-                for i in os.listdir(self.sub_dst + "/sleep_wake_predictions/") if i.endswith(".h5")
-                if ".DS_Store" not in i
-            ]
-        )
-        # endpoints (graphs/charts per day)
-        endpoints = pd.read_csv(
-            self.sub_dst + "/sleep_endpoints/sleep_endpoints_summary.csv",
-            index_col="day",
-        )
-
-        days = range(0, len(rdays))
-        for day in days:
-            # read the raw data, downsample for plotting
-            raw = pd.read_hdf(rdays[day])
-            raw = raw.resample("60s").median()
-
-            # get shared index
-            idx = pd.date_range(
-                start=raw.index[0].replace(hour=12, minute=0, second=0, microsecond=0),
-                periods=1440,
-                freq="60s",
-            )
-            raw = raw.reindex(idx, fill_value=float("nan"))
-
-            # read the wear data, resample and match index with the raw data
-            wear = pd.read_hdf(wdays[day])  # 15 minute period
-            wear[wear == 0] = float("nan")
-            wear = wear.resample("60s").ffill()
-            wear = wear.reindex(idx, fill_value=float("nan"))
-
-            # read the wear data with rescoring, resample and match the raw index
-            wear_re = pd.read_hdf(wdays_re[day])  # 15 minute period
-            wear_re[wear_re == 0] = float("nan")
-            wear_re = wear_re.resample("60s").ffill()
-            wear_re = wear_re.reindex(idx, fill_value=float("nan"))
-
-            # read the arm angle data, resample and match the raw index
-            angle = pd.read_hdf(mrdays_aa[day])  # 5 second period
-            angle = angle.resample("60s").max()
-            angle = angle.reindex(idx, fill_value=float("nan"))
-
-            # read the major rest period data, resample and match the raw index
-            periods = pd.read_hdf(mrdays_rp[day])  # 5 second period
-            periods[periods == 1] = float("nan")
-            periods[periods == 0] = 1
-            periods = periods.resample("60s").max()
-            periods = periods.reindex(idx, fill_value=float("nan"))
-
-            # read the acvitity index data, resample and match the raw index
-            aindex = pd.read_hdf(aidays[day])  # 1 minute period
-            aindex = aindex.resample("60s").max()
-            aindex = aindex.reindex(idx, fill_value=float("nan"))
-
-            # read the sleep wake predictions, resample and match the raw index
-            swake = pd.read_hdf(swdays[day])  # 1 minute period
-            swake[swake == 0] = float("nan")
-            swake = swake.resample("60s").max()
-            swake = swake.reindex(idx, fill_value=float("nan"))
-
-            # build a dataframe for plotting certain data streams as straight lines
-            df = swake.copy()
-            df.columns = ["wake"]
-            df["rest periods"] = periods.values - 0.05
-            df["on body"] = wear.values - 0.1
-            df["on body(rescore)"] = wear_re.values - 0.15
-            swake, wear, wear_re, periods = [], [], [], []
-
-            # get day endpoints for plotting of table
-            t_labels = (
-                "Total Sleep Time(minutes)",
-                "Percent Time Asleep",
-                "Wake After Sleep Onset(minutes)",
-                "Sleep Onset Latency(minutes)",
-                "Number of Wake Bouts",
+        days = self._days("raw")
+        if self.lazy_reports:
+            series = self._map_days("_plot_series_day", days)
+            series = pd.concat(series, keys=days, names=["day"])
+            series = self._keep_final_days(
+                series,
+                self.sub_dst + "/reports/plot_series.csv",
+                lambda path: pd.read_csv(
+                    path, parse_dates=["Time"], float_precision="round_trip"
+                ).set_index(["day", "Time"]),
             )
-            # t_vals = [endpoints.loc[day + 1][["total_sleep_time", "sleep_efficiency", "waso", "sleep_onset_latency",
-            #                                   "num_active_periods"]].values]
-            t_vals = [np.array([int(endpoints.loc[day + 1]["total_sleep_time"] / 60.0),
-                      endpoints.loc[day + 1]["sleep_efficiency"],
-                      int(endpoints.loc[day + 1]["waso"] / 60.0),
-                      int(endpoints.loc[day + 1]["sleep_onset_latency"] / 60.0),
-                      endpoints.loc[day + 1]["num_active_periods"]])]
-            
-            # plotting
-            fig, (axt, ax0, ax1, ax2, ax3, ax4, ax5) = plt.subplots(
-                7, 1, figsize=(30, 15)
-            )
-            plt.suptitle(
-                "Visual Report for Source: {}\nDay: {}\nDate: {}".format(
-                    self.src_name, day + 1, idx[0].date()
-                ),
-                fontsize=25,
-            )
-            hours = mdates.HourLocator(interval=1)
-            h_fmt = mdates.DateFormatter("%H:%M")
-            all_axes = (ax0, ax1, ax2, ax3, ax4, ax5)
-
-            # plot table
-            tbl = axt.table(
-                cellText=t_vals,
-                colLabels=t_labels,
-                cellLoc="center",
-                rowLoc="center",
-                loc="center",
-                fontsize=20,
-            )
-            tbl.auto_set_font_size(False)
-            tbl.set_fontsize(24)
-            tbl.scale(1.1, 2.4)
-            axt.axis("off")
-
-            # plot raw
-            raw.rename(columns={"T": "Temperature", "LUX": "Light"}, inplace=True)
-            raw[["X", "Y", "Z"]].plot(ax=ax0, lw=1).legend(
-                bbox_to_anchor=(0, 1), fontsize=20
-            )
-            ax0.set_ylabel("")
-            ax0.set_xlabel("")
-
-            # plot temperature
-            raw[["Temperature"]].plot(
-                ax=ax1, lw=1, color=sns.xkcd_rgb["pale red"]
-            ).legend(bbox_to_anchor=(0, 1), fontsize=20)
-            ax1.axhline(y=self.min_t, color="r", linestyle="--", lw=2)
-            props = dict(boxstyle="round", facecolor="lavender", alpha=0.35)
-            textstr = u"max: {}\xb0C\nmin: {}\xb0C\nthresh: {}\xb0C".format(
-                raw[["Temperature"]].max().values[0],
-                raw[["Temperature"]].min().values[0],
-                self.min_t,
-            )
-            ax1.text(
-                0.005,
-                0.95,
-                textstr,
-                transform=ax1.transAxes,
-                fontsize=14,
-                verticalalignment="top",
-                bbox=props,
-            )
-            ax1.set_ylabel("")
-            ax1.set_xlabel("")
+            series.reset_index(level="day").to_csv(self.sub_dst + "/reports/plot_series.csv")
+            return
 
-            # plot light
-            raw[["Light"]].plot(ax=ax2, lw=1, color=sns.xkcd_rgb["pale orange"]).legend(
-                bbox_to_anchor=(0, 1), fontsize=20
+        # endpoints (graphs/charts per day), kept in memory if they were calculated in this run
+        if self.endpoints is not None:
+            endpoints = self.endpoints
+        else:
+            endpoints = pd.read_csv(
+                self.sub_dst + "/sleep_endpoints/sleep_endpoints_summary.csv",
+                index_col="day",
             )
-            ax2.set_ylabel("")
-            ax2.set_xlabel("")
 
-            # plot activity index
-            aindex.plot(ax=ax3, lw=1, color="#6fc276").legend(
-                labels=["activity"], bbox_to_anchor=(0, 0.75), fontsize=20
-            )
-            ax3.set_ylabel("")
-            ax3.set_xlabel("")
+        self._map_days(
+            "_report_day", days, [day - 1 for day in days], [endpoints] * len(days)
+        )
 
-            # plot arm angle
-            angle.plot(ax=ax4, lw=1, color="#b36ff6").legend(
-                labels=["arm angle"], bbox_to_anchor=(0, 0.75), fontsize=20
-            )
-            ax4.set_ylabel("")
-            ax4.set_xlabel("")
+        # generate a summary plot from endpoint data
+        plot_summary(endpoints, self.src_name, self.sub_dst + "/reports/Summary_Report.pdf")
 
-            # plot dataframe of 4 streams
-            df.plot(ax=ax5, lw=8, x_compat=True).legend(
-                bbox_to_anchor=(0, 1.3), fontsize=20
-            )
-            ax5.set_ylabel("")
-            ax5.set_xlabel("")
-
-            # plot formatting
-            plt.draw()
-            count = 0
-            for ax in all_axes:
-                count += 1
-                ax.spines["top"].set_visible(False)
-                ax.spines["right"].set_visible(False)
-                ax.spines["bottom"].set_visible(False)
-                ax.spines["left"].set_visible(False)
-                ax.grid(False)
-                if count < 6:
-                    ax.get_xaxis().set_ticks([])
-                ax.get_yaxis().set_ticks([])
-            ax5.xaxis.set_major_locator(hours)
-            ax5.xaxis.set_major_formatter(h_fmt)
-            plt.subplots_adjust(wspace=0, hspace=0)
-            fig.autofmt_xdate()
-            for tick in ax5.xaxis.get_major_ticks():
-                tick.label.set_fontsize(16)
-            plt.savefig(
-                self.sub_dst + "/reports/Visual_Results_Day_{}.pdf".format(day + 1)
-            )
-            plt.close()
+    def render_reports(self, workers=None):
+        """
+        Renders the visual reports of a run with lazy_reports, from the plot series saved in its results.
 
-        # generate a summary plot from endpoint data
-        fig, (ax0, ax1, ax2, ax3, ax4) = plt.subplots(5, 1, figsize=(12, 12))
-        plt.suptitle("Summary Report for Source: {}".format(self.src_name), fontsize=16)
-        all_axes = (ax0, ax1, ax2, ax3, ax4)
-        ylabels = [
-            "Total Sleep\nTime(min)\nMean: {}".format(
-                int(np.round(endpoints.total_sleep_time.mean()))
-            ),
-            "Percent Time\nAsleep\nMean: {}".format(
-                int(np.round(endpoints.sleep_efficiency.mean()))
-            ),
-            "Wake After\nSleep Onset(min)\nMean: {}".format(
-                int(np.round(endpoints.waso.mean()))
-            ),
-            "Sleep Onset\nLatency(min)\nMean: {}".format(
-                int(np.round(endpoints.sleep_onset_latency.mean()))
-            ),
-            "Number of\nWake Bouts\nMean: {}".format(
-                int(np.round(endpoints.num_active_periods.mean()))
-            ),
-        ]
+        :param workers: number of processes to render the reports in (default self.workers)
+        :return: list of paths of the reports
+        """
+        return render_reports(
+            self.sub_dst + "/results",
+            self.src_name,
+            self.min_t,
+            workers=workers or self.workers,
+        )
 
-        # plot total sleep time
-        endpoints.total_sleep_time.plot.bar(ax=ax0, title="")
-        # plot percent time asleep
-        endpoints.sleep_efficiency.plot.bar(ax=ax1, title="")
-        # plot wake after sleep onset
-        endpoints.waso.plot.bar(ax=ax2, title="")
-        # plot sleep onset latency
-        endpoints.sleep_onset_latency.plot.bar(ax=ax3, title="")
-        # plot the number of wake bouts
-        endpoints.num_active_periods.plot.bar(ax=ax4, title="")
-        # plot formatting
-        count = 0
-        for ax in all_axes:
-            count += 1
-            ax.spines["top"].set_visible(False)
-            ax.spines["right"].set_visible(False)
-            ax.spines["bottom"].set_visible(False)
-            ax.spines["left"].set_visible(False)
-            ax.grid(False)
-            ax.set_ylabel(ylabels[count - 1], rotation=0, fontsize=12, labelpad=50)
-            if count < 5:
-                ax.set_xlabel("")
-                ax.get_xaxis().set_ticks([])
-                ax.get_yaxis().set_ticks([])
-            else:
-                ax.set_xlabel("Day", fontsize=20)
-                ax.get_yaxis().set_ticks([])
-            plt.setp(ax.xaxis.get_majorticklabels(), rotation=0)
-            for p in ax.patches:
-                ax.annotate(
-                    np.round(p.get_height(), decimals=2),
-                    (p.get_x() + p.get_width() / 2.0, 0),
-                    ha="center",
-                    va="center",
-                    xytext=(0, 10),
-                    textcoords="offset points",
-                    fontweight="bold",
+    def _plot_series_day(self, day):
+        """
+        Downsamples the data of one day to the 1 minute series plotted in its visual report.
+
+        :param day: day number
+        :return: empty list of data to save, and pandas dataframe of the plot series (see PLOT_SERIES)
+        """
+        # read the raw data downsampled when it was split, or downsample it for plotting
+        if day in self.store.days("raw_minutes"):
+            raw = self.store.read("raw_minutes", day)
+        else:
+            raw = self.store.read("raw", day).resample("60s").median()
+
+        # get shared index
+        idx = pd.date_range(
+            start=raw.index[0].replace(hour=12, minute=0, second=0, microsecond=0),
+            periods=1440,
+            freq="60s",
+        )
+        raw = raw.reindex(idx, fill_value=float("nan"))
+
+        # read the wear data, resample and match index with the raw data
+        wear = self.store.read("wear", day)  # 15 minute period
+        wear = wear.where(wear != 0)
+        wear = wear.resample("60s").ffill()
+        wear = wear.reindex(idx, fill_value=float("nan"))
+
+        # read the wear data with rescoring, resample and match the raw index
+        wear_re = self.store.read("wear_rescored", day)  # 15 minute period
+        wear_re = wear_re.where(wear_re != 0)
+        wear_re = wear_re.resample("60s").ffill()
+        wear_re = wear_re.reindex(idx, fill_value=float("nan"))
+
+        # read the arm angle data, resample and match the raw index
+        angle = self.store.read("arm_angle", day)  # 5 second period
+        angle = angle.resample("60s").max()
+        angle = angle.reindex(idx, fill_value=float("nan"))
+
+        # read the major rest period data, resample and match the raw index
+        periods = self.store.read("rest_periods", day)  # 5 second period
+        periods = periods.where(periods != 1).mask(periods == 0, 1)
+        periods = periods.resample("60s").max()
+        periods = periods.reindex(idx, fill_value=float("nan"))
+
+        # read the acvitity index data, resample and match the raw index
+        aindex = self.store.read("activity_index", day)  # 1 minute period
+        aindex = aindex.resample("60s").max()
+        aindex = aindex.reindex(idx, fill_value=float("nan"))
+
+        # read the sleep wake predictions, resample and match the raw index
+        swake = self.store.read("sleep_wake", day)  # 1 minute period
+        swake = swake.where(swake != 0)
+        swake = swake.resample("60s").max()
+        swake = swake.reindex(idx, fill_value=float("nan"))
+
+        series = raw[["X", "Y", "Z", "LUX", "T"]].copy()
+        series["activity_index"] = aindex.activity_index.values
+        series["arm_angle"] = angle.values
+        series["sleep_wake"] = swake.sleep_predictions.values
+        series["rest_periods"] = periods.Data.values
+        series["wear"] = wear.wear.values
+        series["wear_rescored"] = wear_re.wear.values
+        series.index.name = "Time"
+        return [], series[PLOT_SERIES]
+
+    def _report_day(self, store_day, day, endpoints):
+        """
+        Generates the visual report of one day.
+
+        :param store_day: day number in the intermediate data
+        :param day: position of the day in the recording (starting at 0)
+        :param endpoints: pandas dataframe of the endpoints of every day
+        :return: empty list of data to save, and None
+        """
+        series = self._plot_series_day(store_day)[1]
+        plot_day(
+            series,
+            endpoints,
+            self.src_name,
+            day + 1,
+            self.min_t,
+            self.sub_dst + "/reports/Visual_Results_Day_{}.pdf".format(day + 1),
+        )
+        return [], None
+
+    def _map_days(self, method, days, *args):
+        """
+        Runs a per-day method on every day, in a pool of worker processes if self.workers is more than 1, and saves the
+        data returned for each day in day order.
+
+        :param method: name of the per-day method, returning a list of (family, data) to save and a value
+        :param days: list of day numbers
+        :param args: further per-day arguments of the method, one sequence each
+        :return: list of the values returned for each day
+        """
+        instrumented = [self.instrument is not None] * len(days)
+        if self.workers > 1 and len(days) > 1:
+            tasks = [self._day_task(day) for day in days]
+            with ProcessPoolExecutor(min(self.workers, len(days))) as pool:
+                results = pool.map(
+                    _run_day, tasks, [method] * len(days), instrumented, days, *args
                 )
-        plt.subplots_adjust(wspace=0, hspace=0.01)
-        plt.xticks(fontsize=20)
-        plt.draw()
-        plt.savefig(self.sub_dst + "/reports/Summary_Report.pdf")
-        plt.close()
+                return self._save_days(days, results)
+        results = (
+            _run_day(self, *a) for a in zip([method] * len(days), instrumented, days, *args)
+        )
+        return self._save_days(days, results)
+
+    def _save_days(self, days, results):
+        """
+        Saves the data returned by a per-day method as the results come in.
+
+        :param days: list of day numbers
+        :param results: iterable of ((list of (family, data), value), measurement record) per day
+        :return: list of the values returned for each day
+        """
+        values = []
+        for day, ((outputs, value), record) in zip(days, results):
+            if record is not None:
+                self.instrument.count_rows(record["rows"])
+                self.instrument.add(record)
+            for family, data in outputs:
+                self.store.write(family, day, data)
+            values.append(value)
+        return values
+
+    def _day_task(self, day):
+        """
+        Copy of this instance to send to a worker process, without the source recording and the instrumentation, and
+        with an in-memory store cut down to the given day.
+
+        :param day: day number
+        :return: SleepPy instance
+        """
+        task = _copy.copy(self)
+        task.src = None
+        task.instrument = None
+        if self.storage == "memory":
+            task.store = self.store.subset([day])
+        return task
 
     def rescore(self, df):
         """
@@ -1173,32 +1255,22 @@ class SleepPy:
         :return: rescored pandas dataframe of wear/nonwear predictions
         """
         # group classifications into wear and nonwear blocks
-        df["block"] = (df.wear.diff().ne(0)).cumsum()
-        blocks = list(df.groupby("block"))
-
-        # iterate through blocks
-        for i in range(1, len(blocks) - 1):
-            wear = blocks[i][1]["wear"].values[
-                0
-            ]  # get whether or not the block is wear
-            if wear:
-                # get hour lengths of the previous, current, and next blocks
-                prev, current, post = (
-                    len(blocks[i - 1][1]) * 0.25,
-                    len(blocks[i][1]) * 0.25,
-                    len(blocks[i + 1][1]) * 0.25,
-                )
-                # if the current block is less than 3 hours and the ratio to previous and post blocks is less than 80%
-                if current < 3 and current / (prev + post) < 0.8:
-                    df["wear"][
-                        df.block == blocks[i][0]
-                    ] = 0  # rescore the wear period as non wear
-                # if the current block is less than 6 hours and the ratio to previous and post blocks is less than 30%
-                elif current < 6 and current / (prev + post) < 0.3:
-                    df["wear"][
-                        df.block == blocks[i][0]
-                    ] = 0  # rescore the wear period as non wear
-        df.drop(columns=["block"], inplace=True)
+        starts, lengths, values = run_lengths(df.wear.values)
+
+        # get hour lengths of the previous, current, and next blocks
+        current = lengths * 0.25
+        prev = np.r_[np.nan, current[:-1]]
+        post = np.r_[current[1:], np.nan]
+        with np.errstate(invalid="ignore"):
+            ratio = current / (prev + post)
+
+        # if the current block is less than 3 hours and the ratio to previous and post blocks is less than 80%, or
+        # if the current block is less than 6 hours and the ratio to previous and post blocks is less than 30%
+        # rescore the wear period as non wear (first and last blocks excluded)
+        short = ((current < 3) & (ratio < 0.8)) | ((current < 6) & (ratio < 0.3))
+        df["wear"] = fill_runs(
+            values, lengths, inner_runs(len(values)) & (values != 0) & short, 0
+        )
         return df
 
     def rescore_last_day(self, df):
@@ -1210,28 +1282,26 @@ class SleepPy:
         :return: rescored pandas dataframe of wear/nonwear predictions
         """
         # group classifications into wear and nonwear blocks
-        df["block"] = (df.wear.diff().ne(0)).cumsum()
-        blocks = list(df.groupby("block"))
+        starts, lengths, values = run_lengths(df.wear.values)
 
         # get the start index of the last day
         last_day_index = df.index[-1] - pd.to_timedelta("24h")
 
-        # iterate through blocks
-        for i in range(1, len(blocks)):
-            wear = blocks[i][1]["wear"].values[
-                0
-            ]  # get whether or not the block is wear
-            if (
-                wear and blocks[i][1].index[0] > last_day_index
-            ):  # if wear, and it's the last day
-                # get hour lengths of the previous and current blocks
-                prev, current = len(blocks[i - 1][1]) * 0.25, len(blocks[i][1]) * 0.25
-                # if the current block is less than 3 hours and the previous block is greater or equal to 1 hour
-                if current < 3 and prev >= 1:
-                    df["wear"][
-                        df.block == blocks[i][0]
-                    ] = 0  # rescore the wear period as non wear
-        df.drop(columns=["block"], inplace=True)
+        # get hour lengths of the previous and current blocks
+        current = lengths * 0.25
+        prev = np.r_[np.nan, current[:-1]]
+
+        # if wear, and it's the last day, rescore the wear period as non wear if the current block is less than 3
+        # hours and the previous block is greater or equal to 1 hour (first block excluded)
+        last_day = np.asarray(df.index[starts] > last_day_index)
+        rescore = (
+            (np.arange(len(values)) > 0)
+            & (values != 0)
+            & last_day
+            & (current < 3)
+            & (prev >= 1)
+        )
+        df["wear"] = fill_runs(values, lengths, rescore, 0)
         return df
 
     def aggregate_results(self):
@@ -1280,7 +1350,29 @@ class SleepPy:
 
         # delete
         for direc in direcs:
-            rmtree(direc)
+            if os.path.isdir(direc):
+                rmtree(direc)
+            else:
+                os.remove(direc)
+
+
+def _run_day(sleeppy, method, instrumented, day, *args):
+    """
+    Runs a per-day method of a SleepPy instance, possibly in a worker process, measuring it if asked to.
+
+    :param sleeppy: SleepPy instance
+    :param method: name of the per-day method
+    :param instrumented: boolean flag to measure the method
+    :param day: day number
+    :param args: further arguments of the method
+    :return: tuple of the result of the method and the measurement record (None if not measured)
+    """
+    if not instrumented:
+        return getattr(sleeppy, method)(day, *args), None
+    with measure(method.strip("_"), day) as record:
+        result = getattr(sleeppy, method)(day, *args)
+        record["rows"] = sum(len(data) for family, data in result[0])
+    return result, record
 
 
 class ColeKripke:
@@ -1309,10 +1401,7 @@ class ColeKripke:
 
         :return: rescored predictions
         """
-        kernel = (
-            sf
-            * np.array([4.64, 6.87, 3.75, 5.07, 16.19, 5.84, 4.024, 0.00, 0.00])[::-1]
-        )
+        kernel = sf * CK_WEIGHTS
         scores = np.convolve(self.activity_index, kernel, "same")
         scores[scores >= 0.5] = 1
         scores[scores < 0.5] = 0
@@ -1328,47 +1417,11 @@ class ColeKripke:
         :param predictions: array of predictions
         :return: rescored predictions
         """
-        rescored = predictions.copy()
-        # rules a through c
-        wake_bin = 0
-        for t in range(len(rescored)):
-            if rescored[t] == 1:
-                wake_bin += 1
-            else:
-                if (
-                    14 < wake_bin
-                ):  # rule c: at least 15 minutes of wake, next 4 minutes of sleep get rescored
-                    rescored[t : t + 4] = 1.0
-                elif (
-                    9 < wake_bin < 15
-                ):  # rule b: at least 10 minutes of wake, next 3 minutes of sleep get rescored
-                    rescored[t : t + 3] = 1.0
-                elif (
-                    3 < wake_bin < 10
-                ):  # rule a: at least 4 minutes of wake, next 1 minute of sleep gets rescored
-                    rescored[t] = 1.0
-                wake_bin = 0
-        # rule d: 6 minutes or less of sleep surrounded by at least 10 minutes of wake on each side gets rescored
-        sleep_bin = 0
-        start_ind = 0
-        for t in range(10, len(rescored) - 10):
-            if rescored[t] == 0:
-                sleep_bin += 1
-                if sleep_bin == 1:
-                    start_ind = t
-            else:
-                if 0 < sleep_bin <= 6:
-                    if (
-                        sum(rescored[start_ind - 10 : start_ind]) == 10.0
-                        and sum(rescored[t : t + 10]) == 10.0
-                    ):
-                        rescored[start_ind:t] = 1.0
-                sleep_bin = 0
-        self.predictions = rescored
+        self.predictions = webster_rescore(predictions)
 
 
 def band_pass_filter(
-    data_df, sampling_rate, bp_cutoff, order, channels=["X", "Y", "Z"]
+    data_df, sampling_rate, bp_cutoff, order, channels=["X", "Y", "Z"], form="ba"
 ):
     """
     Band-pass filter a given sensor signal.
@@ -1378,23 +1431,16 @@ def band_pass_filter(
     :param bp_cutoff: filter cutoffs
     :param order: filter order
     :param channels: channels of signal to filter
+    :param form: form of the filter, "ba" (filtfilt, default) or "sos" (second-order sections, sosfiltfilt)
     :return: dataframe of raw and filtered data
     """
     data = data_df[channels].values
 
-    # Calculate the critical frequency (radians/sample) based on cutoff frequency (Hz) and sampling rate (Hz)
-    critical_frequency = [
-        bp_cutoff[0] * 2.0 / sampling_rate,
-        bp_cutoff[1] * 2.0 / sampling_rate,
-    ]
-
-    # Get the numerator (b) and denominator (a) of the IIR filter
-    [b, a] = signal.butter(
-        N=order, Wn=critical_frequency, btype="bandpass", analog=False
-    )
+    # Get the IIR filter, designed once per sampling rate, cutoffs, order and form
+    design = band_pass_design(sampling_rate, bp_cutoff, order, form)
 
     # Apply filter to raw data
-    bp_filtered_data = signal.filtfilt(b, a, data, padlen=10, axis=0)
+    bp_filtered_data = zero_phase_filter(design, data, axis=0, padlen=10)
 
     new_channel_labels = [ax + "_bp_filt_" + str(bp_cutoff) for ax in channels]
 
@@ -1416,6 +1462,57 @@ def activity_index(signal_df, channels=["X", "Y", "Z"]):
     return ai_df
 
 
+def activity_index_windows(
+    data, sampling_rate, window, bp_cutoff, order, batch_size=60, form="ba", mode="window"
+):
+    """
+    Compute the activity index of consecutive, non-overlapping windows of a multi-channel signal. The band-pass filter
+    is designed once and applied to a batch of windows at a time, either with the same per-window zero phase filtering
+    as band_pass_filter ("window" mode), or to the continuous signal of the batch ("continuous" mode), which has no
+    transients at the window edges. In continuous mode every batch is extended on both sides by the ringing length of
+    the filter, so that the batches together give the values of filtering the whole signal at once while holding only
+    one batch in memory. Only full windows that are followed by further samples are used.
+
+    :param data: array of shape (samples, channels) housing the sensor signals
+    :param sampling_rate: sampling rate of signal
+    :param window: number of samples per window
+    :param bp_cutoff: filter cutoffs
+    :param order: filter order
+    :param batch_size: number of windows to filter at a time
+    :param form: form of the filter, "ba" (filtfilt, default) or "sos" (second-order sections, sosfiltfilt)
+    :param mode: "window" (filter every window on its own, default) or "continuous" (filter the continuous signal)
+    :return: array of activity index values, one per window
+    """
+    if mode not in FILTER_MODES:
+        raise ValueError("unknown filter mode '{}'".format(mode))
+    num_windows = max(0, (len(data) - 1) // window)
+    windows = data[: num_windows * window].reshape(num_windows, window, -1)
+
+    # Get the IIR filter, designed once per sampling rate, cutoffs, order and form
+    design = band_pass_design(sampling_rate, bp_cutoff, order, form)
+    overlap = ringing_length(design)
+
+    ai = np.empty(num_windows)
+    for idx in range(0, num_windows, batch_size):
+        if mode == "window":
+            # filter every window of the batch along the sample axis
+            bp_filtered_data = zero_phase_filter(
+                design, windows[idx : idx + batch_size], axis=1, padlen=10
+            )
+        else:
+            # filter the samples of the batch with the overlap on both sides, and keep the batch
+            start = idx * window
+            stop = min(idx + batch_size, num_windows) * window
+            lo, hi = max(0, start - overlap), min(len(data), stop + overlap)
+            bp_filtered_data = zero_phase_filter(
+                design, data[lo:hi], axis=0, padlen=None
+            )[start - lo : stop - lo].reshape(-1, window, data.shape[1])
+        ai[idx : idx + batch_size] = (
+            np.var(bp_filtered_data, axis=1).mean(axis=1) ** 0.5
+        )
+    return ai
+
+
 def bin2df(full_path):
     """
 
@@ -1426,97 +1523,25 @@ def bin2df(full_path):
     :return decode: pandas dataframe of GA data
 
     """
-    with open(full_path, "rb") as in_file:
-        full_line = in_file.readline()
-        count = 0
-        fs = ""
-        df = []
-        while full_line:
-            full_line = in_file.readline()
-            line = full_line[:].split(b"\r\n")[0]
-            count += 1
-            if count < 60:
-                if b"x gain" in line:
-                    x_gain = int(line.split(b":")[-1])
-
-                if b"x offset" in line:
-                    x_offset = int(line.split(b":")[-1])
-
-                if b"y gain" in line:
-                    y_gain = int(line.split(b":")[-1])
-
-                if b"y offset" in line:
-                    y_offset = int(line.split(b":")[-1])
-
-                if b"z gain" in line:
-                    z_gain = int(line.split(b":")[-1])
-
-                if b"z offset" in line:
-                    z_offset = int(line.split(b":")[-1])
+    return read_bin(full_path)
 
-                if b"Volts" in line:
-                    volts = int(line.split(b":")[-1])
 
-                if b"Lux" in line:
-                    lux = int(line.split(b":")[-1])
 
-            if b"Page Time:" in line:
-                time = pd.to_datetime(
-                    b":".join(line.split(b":")[1:])[0:-2].decode("utf-8"), format="%Y-%m-%d %H:%M:%S:%f"
-                )
-
-            if b"Temperature:" in line:
-                temp = float(line.split(b":")[-1])
-
-            if not fs:
-                if b"Measurement Frequency:" in line:
-                    fs = float(line.split(b":")[-1].split(b" ")[0])
-                    offset = np.array([1 / fs] * 300) * np.arange(0, 300)
-                    delta = pd.to_timedelta(offset, unit="s")
-
-            if len(line) == 3600:
-                # hex to bin
-                hexes = struct.unpack("12s " * 300, line)
-                # hexes = tuple(
-                #     hx.decode("utf-8") for hx in hexes
-                # )
-                bins = (
-                    struct.unpack(
-                        "12s 12s 12s 10s 1s 1s", bin(int(hx, 16))[2:].zfill(48).encode()
-                    )
-                    for hx in hexes
-                )
-
-                st = datetime.datetime.now()
-                decode = pd.DataFrame(
-                    bins,
-                    columns=["X", "Y", "Z", "LUX", "Button", "_"],
-                    index=pd.DatetimeIndex([time] * 300) + delta,
-                )
+def read_major_rest_periods(path):
+    """
+    Reads the major rest periods saved by SleepPy.major_rest_period. Files written by earlier versions, which hold every
+    major rest period as the text of a list of two Timestamps, are parsed into the same columns.
 
-                # binary to decimal and calibration
-                decode.X = decode.X.apply(
-                    lambda x: round(
-                        (BitArray(bin=x.decode()).int * 100.0 - x_offset) / x_gain, 4
-                    )
-                )
-                decode.Y = decode.Y.apply(
-                    lambda x: round(
-                        (BitArray(bin=x.decode()).int * 100.0 - y_offset) / y_gain, 4
-                    )
-                )
-                decode.Z = decode.Z.apply(
-                    lambda x: round(
-                        (BitArray(bin=x.decode()).int * 100.0 - z_offset) / z_gain, 4
-                    )
-                )
-                decode.LUX = decode.LUX.apply(lambda x: int(x.decode(), 2) * lux / volts)
-                decode["T"] = temp
-                df.append(decode)
-                
-                stp = datetime.datetime.now()
-                print("Total run time to decode 300 readings: {} seconds".format((stp - st).total_seconds()))
-
-        df = pd.concat(df, axis=0)
-        df.index.name = "Time"
-        return df[["X", "Y", "Z", "LUX", "T"]]
+    :param path: path of the <src_name>_major_rest_periods.csv file
+    :return: pandas dataframe of the start and end times (NaT if there is no rest period) and the available hours of
+    every day, indexed by day
+    """
+    mrps = pd.read_csv(path, index_col="day")
+    if "major_rest_period" in mrps.columns:
+        times = mrps.pop("major_rest_period").astype(str).str.extract(
+            r"Timestamp\('([^']+)'[^)]*\), Timestamp\('([^']+)'[^)]*\)"
+        )
+        mrps["start"], mrps["end"] = times[0].values, times[1].values
+    for column in ("start", "end"):
+        mrps[column] = pd.to_datetime(mrps[column])
+    return mrps[MRP_COLUMNS]
@@ -0,0 +1,302 @@
+import os
+import re
+import pandas as pd
+
+__all__ = [
+    "FAMILIES",
+    "DayStore",
+    "HDFDayStore",
+    "ArrowDayStore",
+    "ParquetDayStore",
+    "MemoryDayStore",
+    "open_store",
+]
+
+# per-day hdf5 layout of every family of intermediate data: directory, file name and key
+HDF_LAYOUT = {
+    "raw": ("raw_days", "{src}_day_{day}.h5", "raw_geneactiv_data_24hr"),
+    "raw_minutes": (
+        "raw_days",
+        "{src}_1_minute_medians_day_{day}.h5",
+        "raw_geneactiv_data_1min",
+    ),
+    "activity_index": (
+        "activity_index_days",
+        "{src}_activity_index_day_{day}.h5",
+        "activity_index_data_24hr",
+    ),
+    "wear": ("wear_detection", "wear_detection_day_{day}.h5", "wear_detection_24hr"),
+    "wear_rescored": (
+        "wear_detection",
+        "wear_detection_rescored_day_{day}.h5",
+        "wear_detection_rescored_24hr",
+    ),
+    "arm_angle": (
+        "major_rest_period",
+        "5_second_average_arm_angle_day_{day}.h5",
+        "arm_angle_data_24hr",
+    ),
+    "rest_periods": (
+        "major_rest_period",
+        "rest_periods_day_{day}.h5",
+        "rest_period_data_24hr",
+    ),
+    "sleep_wake": (
+        "sleep_wake_predictions",
+        "sleep_wake_day_{day}.h5",
+        "sleep_wake_data_24hr",
+    ),
+}
+FAMILIES = list(HDF_LAYOUT)
+
+
+class DayStore:
+    """
+    Storage for the intermediate data of the SleepPy stages. Every family of data (raw days, activity index, wear
+    predictions, ...) holds one pandas object per day, indexed by day number (starting at 1).
+    """
+
+    def __init__(self, root, src_name):
+        """
+        Initialization of the class
+
+        :param root: directory of the recording's intermediate data
+        :param src_name: name of the source recording
+        """
+        self.root = root
+        self.src_name = src_name
+
+    def write(self, family, day, data):
+        """
+        Saves the data of one day.
+
+        :param family: name of the family of data
+        :param day: day number
+        :param data: pandas dataframe or series
+        """
+        raise NotImplementedError
+
+    def read(self, family, day, columns=None):
+        """
+        Loads the data of one day.
+
+        :param family: name of the family of data
+        :param day: day number
+        :param columns: list of columns to load (default all)
+        :return: pandas dataframe or series
+        """
+        raise NotImplementedError
+
+    def days(self, family):
+        """
+        Lists the days saved for a family of data.
+
+        :param family: name of the family of data
+        :return: sorted list of day numbers
+        """
+        raise NotImplementedError
+
+    def copy_to(self, other, families=None):
+        """
+        Copies every saved day to another store, e.g. to persist the results of an in-memory run.
+
+        :param other: DayStore instance to copy the data to
+        :param families: list of families to copy (default all)
+        """
+        for family in families or FAMILIES:
+            for day in self.days(family):
+                other.write(family, day, self.read(family, day))
+
+    def _mkdir(self, directory):
+        try:
+            os.mkdir(directory)  # set up output directory
+        except OSError:
+            pass
+
+
+class HDFDayStore(DayStore):
+    """
+    Saves every day of every family in its own .h5 file, in the original SleepPy directory layout.
+    """
+
+    def _path(self, family, day):
+        directory, name, key = HDF_LAYOUT[family]
+        name = name.format(src=self.src_name, day=str(day).zfill(2))
+        return self.root + "/" + directory + "/" + name, key
+
+    def write(self, family, day, data):
+        self._mkdir(self.root + "/" + HDF_LAYOUT[family][0])
+        path, key = self._path(family, day)
+        data.to_hdf(path, key=key, mode="w")
+
+    def read(self, family, day, columns=None):
+        path, key = self._path(family, day)
+        data = pd.read_hdf(path)
+        if columns is not None:
+            data = data[columns]
+        return data
+
+    def days(self, family):
+        directory, name, key = HDF_LAYOUT[family]
+        pattern = re.compile(
+            re.escape(name)
+            .replace(re.escape("{src}"), re.escape(self.src_name))
+            .replace(re.escape("{day}"), r"(\d+)")
+        )
+        try:
+            files = os.listdir(self.root + "/" + directory)
+        except OSError:
+            return []
+        matches = [pattern.fullmatch(i) for i in files]
+        return sorted(int(m.group(1)) for m in matches if m)
+
+
+class _TableDayStore(DayStore):
+    """
+    Saves every family as a dataset of per-day Arrow tables, <root>/<family>/day=NN.<extension>. The index is stored as
+    a column, and series are marked in the schema metadata so they are read back as series.
+    """
+
+    extension = ""
+
+    def _path(self, family, day):
+        return self.root + "/" + family + "/day={}".format(str(day).zfill(2)) + self.extension
+
+    def write(self, family, day, data):
+        import pyarrow as pa
+
+        self._mkdir(self.root + "/" + family)
+        is_series = isinstance(data, pd.Series)
+        if is_series:
+            data = data.to_frame()
+        table = pa.Table.from_pandas(data, preserve_index=True)
+        metadata = dict(table.schema.metadata)
+        metadata[b"sleeppy_series"] = b"1" if is_series else b"0"
+        self._write_table(table.replace_schema_metadata(metadata), self._path(family, day))
+
+    def read(self, family, day, columns=None):
+        table = self._read_table(self._path(family, day), columns)
+        data = table.to_pandas(split_blocks=True)
+        if table.schema.metadata.get(b"sleeppy_series") == b"1":
+            data = data.iloc[:, 0]
+        return data
+
+    def days(self, family):
+        try:
+            files = os.listdir(self.root + "/" + family)
+        except OSError:
+            return []
+        pattern = re.compile(r"day=(\d+)" + re.escape(self.extension))
+        matches = [pattern.fullmatch(i) for i in files]
+        return sorted(int(m.group(1)) for m in matches if m)
+
+    def _write_table(self, table, path):
+        raise NotImplementedError
+
+    def _read_table(self, path, columns):
+        raise NotImplementedError
+
+
+class ArrowDayStore(_TableDayStore):
+    """
+    Saves every day as an uncompressed Arrow IPC file. Files are memory-mapped when read and the columns are handed to
+    pandas without copying, so the loaded frames are read-only and only the requested columns are ever paged in.
+    """
+
+    extension = ".arrow"
+
+    def _write_table(self, table, path):
+        import pyarrow as pa
+
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def _read_table(self, path, columns):
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        if columns is not None:
+            index = [c for c in table.schema.pandas_metadata["index_columns"] if isinstance(c, str)]
+            table = table.select(list(columns) + index)
+        return table
+
+
+class ParquetDayStore(_TableDayStore):
+    """
+    Saves every day as a Parquet file. Smaller on disk than Arrow IPC files, at the cost of decoding when read.
+    """
+
+    extension = ".parquet"
+
+    def _write_table(self, table, path):
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path)
+
+    def _read_table(self, path, columns):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(
+            path, columns=columns, memory_map=True, use_pandas_metadata=True
+        )
+
+
+class MemoryDayStore(DayStore):
+    """
+    Keeps every day in memory, so that stages pass their results to each other without any file I/O. Frames are
+    copied when saved, and read back as shallow copies that share memory with the store, so they should not be
+    modified in place.
+    """
+
+    def __init__(self, root, src_name):
+        super().__init__(root, src_name)
+        self.data = {family: {} for family in FAMILIES}
+
+    def write(self, family, day, data):
+        self.data[family][day] = data.copy()
+
+    def read(self, family, day, columns=None):
+        data = self.data[family][day]
+        if columns is not None:
+            data = data[columns]
+        return data.copy(deep=False)
+
+    def days(self, family):
+        return sorted(self.data[family])
+
+    def subset(self, days):
+        """
+        Store holding only some of the days, sharing their data with this one.
+
+        :param days: list of day numbers to keep
+        :return: MemoryDayStore instance
+        """
+        store = MemoryDayStore(self.root, self.src_name)
+        for family, data in self.data.items():
+            store.data[family] = {day: data[day] for day in days if day in data}
+        return store
+
+
+STORES = {
+    "hdf5": HDFDayStore,
+    "arrow": ArrowDayStore,
+    "parquet": ParquetDayStore,
+    "memory": MemoryDayStore,
+}
+
+
+def open_store(storage, root, src_name):
+    """
+    Creates the intermediate data store of a recording.
+
+    :param storage: name of the storage backend ("hdf5", "arrow", "parquet" or "memory")
+    :param root: directory of the recording's intermediate data
+    :param src_name: name of the source recording
+    :return: DayStore instance
+    """
+    if storage not in STORES:
+        raise ValueError(
+            "Unknown storage '{}', expected one of {}".format(storage, sorted(STORES))
+        )
+    return STORES[storage](root, src_name)
@@ -0,0 +1,262 @@
+import os
+from shutil import copyfileobj
+import numpy as np
+import pandas as pd
+from sleeppy.geneactiv import PAGE_SAMPLES, CSV_HEADER_LINES
+
+__all__ = ["synthetic_recording", "write_bin", "write_csv"]
+
+# calibration data written to the header of synthetic .bin files
+CALIBRATION = {
+    "x_gain": 25548,
+    "x_offset": 574,
+    "y_gain": 25770,
+    "y_offset": -2743,
+    "z_gain": 25833,
+    "z_offset": -1405,
+    "volts": 300,
+    "lux": 800,
+}
+
+_MILLISECONDS = np.array(["{:03d}".format(i) for i in range(1000)], dtype=object)
+
+BIN_HEADER = """Device Identity
+Device Unique Serial Code:000000
+Device Type:GENEActiv
+Device Model:1.1
+Device Firmware:Ver06.17 15June12
+Calibration Date:{start}
+
+Capabilities
+Accelerometer Range:-8 to 8
+Accelerometer Resolution:0.0039
+Accelerometer Units:g
+Light Meter Range:0 to 3000
+Light Meter Resolution:5
+Light Meter Units:lux
+Temperature Sensor Range:0 to 60
+Temperature Sensor Resolution:0.25
+Temperature Sensor Units:deg. C
+
+Configuration Info
+Measurement Frequency:{fs} Hz
+Measurement Period:{hours} Hours
+Start Time:{start}
+Study Centre:
+Study Code:
+Investigator ID:
+Exercise Type:
+Config Operator ID:
+Config Time:{start}
+Config Notes:synthetic recording
+Extract Operator ID:
+Extract Time:{start}
+Extract Notes:
+
+Trial Info
+Subject Code:
+Date of Birth:
+Sex:
+Height:
+Weight:
+Handedness Code:
+Device Location Code:left wrist
+Subject Notes:
+
+Calibration Data
+x gain:{x_gain}
+x offset:{x_offset}
+y gain:{y_gain}
+y offset:{y_offset}
+z gain:{z_gain}
+z offset:{z_offset}
+Volts:{volts}
+Lux:{lux}
+
+Memory Status
+Number of Pages:{pages}"""
+
+
+def _format_time(times):
+    """
+    Formats time stamps the way GeneActiv files do, with milliseconds after a colon. Every second is formatted once
+    and shared by the samples recorded within it.
+
+    :param times: pandas datetime index
+    :return: array of strings
+    """
+    seconds, inverse = np.unique(times.floor("s"), return_inverse=True)
+    seconds = pd.DatetimeIndex(seconds).strftime("%Y-%m-%d %H:%M:%S:")
+    return np.asarray(seconds, dtype=object)[inverse] + _MILLISECONDS[
+        times.microsecond // 1000
+    ]
+
+
+def synthetic_recording(
+    days,
+    sampling_frequency,
+    start="2019-06-17 10:00:00",
+    sleep=(23.0, 7.0),
+    wake_bouts=(97, 3),
+    non_wear=((28.0, 3.0),),
+    chunk_hours=1.0,
+    seed=0,
+):
+    """
+    Generates a synthetic wrist accelerometer recording with a regular sleep schedule. During the day the arm changes
+    orientation every minute with large movements, at night it lies still with a few short wake bouts, and during
+    non-wear periods the device lies still at room temperature. The recording is generated in chunks, so that long
+    recordings never have to be held in memory.
+
+    :param days: length of the recording in days (float)
+    :param sampling_frequency: sampling frequency in Hz
+    :param start: time stamp of the first sample
+    :param sleep: tuple of the hours of the day at which the subject falls asleep and wakes up
+    :param wake_bouts: tuple of the interval and the length, in minutes, of the wake bouts during the night
+    :param non_wear: tuples of the start (hours from the start of the recording) and the duration (hours) of every
+    period the device is not worn
+    :param chunk_hours: number of hours generated at a time
+    :param seed: seed of the random number generator
+    :return: generator of pandas dataframes of X, Y, Z, LUX and T values indexed by time
+    """
+    fs = sampling_frequency
+    start = pd.Timestamp(start)
+    total = int(days * 86400 * fs)
+    chunk = int(chunk_hours * 3600 * fs)
+    for count, first in enumerate(range(0, total, chunk)):
+        rng = np.random.default_rng([seed, count])
+        n = min(chunk, total - first)
+        samples = np.arange(first, first + n)
+        seconds = samples / float(fs)
+        idx = start + pd.to_timedelta(seconds, unit="s")
+
+        # schedule
+        hour = idx.hour.values + idx.minute.values / 60.0
+        if sleep[0] > sleep[1]:
+            asleep = (hour >= sleep[0]) | (hour < sleep[1])
+        else:
+            asleep = (hour >= sleep[0]) & (hour < sleep[1])
+        awake_bout = asleep & ((seconds // 60) % wake_bouts[0] < wake_bouts[1])
+        worn = np.ones(n, dtype=bool)
+        for off, duration in non_wear:
+            worn &= (seconds < off * 3600) | (seconds >= (off + duration) * 3600)
+
+        # orientation: a new position every minute during the day, every 40 minutes during the night
+        segment = np.where(asleep & worn, seconds // 2400, seconds // 60 + 10 ** 9)
+        _, inverse = np.unique(segment, return_inverse=True)
+        angles = rng.uniform(-np.pi, np.pi, size=(inverse.max() + 1, 2))
+        theta, phi = angles[inverse, 0], angles[inverse, 1] / 2.0
+
+        # movement around the orientation
+        noise = np.where(asleep, 0.004, 0.25)
+        noise[awake_bout] = 0.2
+        noise[~worn] = 0.001
+        x = np.cos(phi) * np.cos(theta) + rng.normal(0, 1, n) * noise
+        y = np.cos(phi) * np.sin(theta) + rng.normal(0, 1, n) * noise
+        z = np.sin(phi) + rng.normal(0, 1, n) * noise
+
+        lux = np.where(asleep, 0.0, 300.0)
+        temperature = np.where(worn, 32.0, 22.0) + rng.normal(0, 0.1, n)
+        yield pd.DataFrame(
+            {
+                "X": x.round(4),
+                "Y": y.round(4),
+                "Z": z.round(4),
+                "LUX": lux,
+                "T": temperature.round(1),
+            },
+            index=pd.DatetimeIndex(idx, name="Time"),
+        )
+
+
+def write_bin(path, chunks, sampling_frequency, calibration=CALIBRATION):
+    """
+    Writes a recording as a GeneActiv .bin file. Samples that do not fill a whole page at the end are dropped.
+
+    :param path: path of the file to write
+    :param chunks: iterable of pandas dataframes of X, Y, Z, LUX and T values indexed by time, every chunk but the
+    last holding a multiple of 300 samples
+    :param sampling_frequency: sampling frequency in Hz
+    :param calibration: dictionary housing gains, offsets, volts and lux written to the header
+    """
+    c = calibration
+    pages, start = 0, ""
+    with open(path + ".pages", "wb") as f:
+        for df in chunks:
+            n = len(df) // PAGE_SAMPLES * PAGE_SAMPLES
+            if n == 0:
+                continue
+            if pages == 0:
+                start = _format_time(df.index[:1])[0]
+
+            # invert the calibration, then pack x, y, z (12 bit) and light (10 bit) into 48 bits per sample
+            packed = np.zeros(n, dtype=np.uint64)
+            for axis, shift in zip("xyz", (36, 24, 12)):
+                raw = np.round(
+                    (df[axis.upper()].values[:n] * c[axis + "_gain"] + c[axis + "_offset"])
+                    / 100.0
+                )
+                raw = np.clip(raw, -2048, 2047).astype(np.int64) & 0xFFF
+                packed |= raw.astype(np.uint64) << np.uint64(shift)
+            light = np.round(df["LUX"].values[:n] * c["volts"] / c["lux"])
+            packed |= np.clip(light, 0, 1023).astype(np.uint64) << np.uint64(2)
+            hex_data = packed.astype(">u8").view(np.uint8).reshape(-1, 8)[:, 2:]
+            hex_data = hex_data.tobytes().hex().upper()
+
+            page_times = _format_time(df.index[:n:PAGE_SAMPLES])
+            temperatures = df["T"].values[:n:PAGE_SAMPLES]
+            for p in range(n // PAGE_SAMPLES):
+                page = [
+                    "Recorded Data",
+                    "Device Unique Serial Code:000000",
+                    "Sequence Number:{}".format(pages),
+                    "Page Time:{}".format(page_times[p]),
+                    "Unassigned:",
+                    "Temperature:{:.1f}".format(temperatures[p]),
+                    "Battery voltage:4.1",
+                    "Device Status:Recording",
+                    "Measurement Frequency:{} Hz".format(float(sampling_frequency)),
+                    hex_data[p * PAGE_SAMPLES * 12 : (p + 1) * PAGE_SAMPLES * 12],
+                ]
+                f.write(("\r\n".join(page) + "\r\n").encode("ascii"))
+                pages += 1
+
+    # the header holds the number of pages, so it is written in front of the pages once they are known
+    header = BIN_HEADER.format(
+        fs=sampling_frequency,
+        hours=int(np.ceil(pages * PAGE_SAMPLES / sampling_frequency / 3600.0)),
+        start=start,
+        pages=pages,
+        **c
+    )
+    with open(path, "wb") as out_file, open(path + ".pages", "rb") as in_file:
+        out_file.write((header.replace("\n", "\r\n") + "\r\n").encode("ascii"))
+        copyfileobj(in_file, out_file)
+    os.remove(path + ".pages")
+
+
+def write_csv(path, chunks):
+    """
+    Writes a recording as a GeneActiv .csv export: 100 header lines followed by one line per sample of time stamp, X,
+    Y, Z, LUX, button and temperature.
+
+    :param path: path of the file to write
+    :param chunks: iterable of pandas dataframes of X, Y, Z, LUX and T values indexed by time
+    """
+    with open(path, "w") as f:
+        f.write("Device Type,GENEActiv\n")
+        for i in range(CSV_HEADER_LINES - 1):
+            f.write("Synthetic header line {},\n".format(i + 1))
+        for df in chunks:
+            out = pd.DataFrame(
+                {
+                    "X": df["X"].values,
+                    "Y": df["Y"].values,
+                    "Z": df["Z"].values,
+                    "LUX": df["LUX"].values.round().astype(np.int64),
+                    "Button": 0,
+                    "T": df["T"].values,
+                },
+                index=_format_time(df.index),
+            )
+            out.to_csv(f, header=False)
@@ -1 +1 @@
-from demo import run_demo
+from .demo import run_demo
@@ -0,0 +1,53 @@
+import os
+from sleeppy.cohort import find_recordings, is_up_to_date, run_key, _endpoints_path, _run_key_path
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x")
+
+
+def test_find_recordings_skips_results(tmp_path):
+    """
+    With the results directory inside the source directory, neither the cohort summary nor the results of the
+    recordings are taken for recordings.
+    """
+    source = str(tmp_path)
+    results = source + "/results"
+    touch(source + "/a.bin")
+    touch(source + "/b.csv")
+    touch(source + "/cohort_endpoints_summary.csv")
+    touch(results + "/cohort_endpoints_summary.csv")
+    touch(results + "/a/results/sleep_endpoints_summary.csv")
+
+    expected = [source + "/a.bin", source + "/b.csv"]
+    assert find_recordings(source, results) == expected
+    assert find_recordings(source + "/*.csv", results) == [source + "/b.csv"]
+    assert find_recordings(results + "/*/results/*.csv", results) == []
+    # the results directory is the source directory
+    touch(source + "/a/results/sleep_endpoints_summary.csv")
+    assert find_recordings(source, source) == expected
+    assert find_recordings(source + "/*/results/*.csv", source) == []
+
+
+def test_is_up_to_date_compares_run_keys(tmp_path):
+    """
+    A recording processed with other arguments is not up to date.
+    """
+    path = str(tmp_path) + "/a.bin"
+    results = str(tmp_path) + "/results"
+    touch(path)
+    touch(_endpoints_path(path, results))
+    key = run_key(path, 100, {"precision": "float64"})
+
+    assert is_up_to_date(path, results)
+    assert not is_up_to_date(path, results, key)
+
+    with open(_run_key_path(path, results), "w") as f:
+        f.write(key)
+    assert is_up_to_date(path, results, key)
+    assert not is_up_to_date(path, results, run_key(path, 100, {"precision": "float32"}))
+    assert not is_up_to_date(path, results, run_key(path, 50, {"precision": "float64"}))
+    # arguments that do not change the results
+    assert is_up_to_date(path, results, run_key(path, 100, {"precision": "float64", "workers": 4}))
@@ -0,0 +1,54 @@
+import os
+import glob
+import shutil
+import pytest
+from sleeppy.sleep import SleepPy
+from sleeppy.synthetic import synthetic_recording, write_bin
+
+pytest.importorskip("pyarrow")
+
+FS = 25
+
+
+def run(source, results_directory, **kwargs):
+    # every run reads the recording from the same path, as a recording downloaded again
+    os.makedirs(results_directory, exist_ok=True)
+    shutil.copy(source, results_directory + "/recording.bin")
+    SleepPy(
+        results_directory + "/recording.bin",
+        results_directory,
+        FS,
+        storage="parquet",
+        precision="float32",
+        lazy_reports=True,
+        **kwargs
+    )
+
+
+def csv_files(results_directory):
+    root = results_directory + "/recording"
+    paths = glob.glob(root + "/**/*.csv", recursive=True)
+    return {os.path.relpath(p, root): open(p, "rb").read() for p in paths}
+
+
+def test_incremental_matches_full_run(tmp_path):
+    """
+    Processing a recording, then the same recording with more data appended, writes the same tables, byte for byte,
+    as processing the longer recording at once, and so does running it again unchanged.
+    """
+    short, full = str(tmp_path / "short.bin"), str(tmp_path / "full.bin")
+    write_bin(short, synthetic_recording(2.5, FS), FS)
+    write_bin(full, synthetic_recording(4.0, FS), FS)
+
+    reference = str(tmp_path / "reference")
+    run(full, reference)
+    expected = csv_files(reference)
+    assert "reports/plot_series.csv" in expected
+
+    incremental = str(tmp_path / "incremental")
+    run(short, incremental, incremental=True)
+    run(full, incremental, incremental=True)
+    assert csv_files(incremental) == expected
+
+    run(full, incremental, incremental=True)
+    assert csv_files(incremental) == expected
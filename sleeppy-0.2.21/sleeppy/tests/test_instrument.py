@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from sleeppy.instrument import measure, reset_peak_rss
+
+
+def allocate(mb):
+    data = np.ones(int(mb * 2 ** 20 / 8))
+    del data
+
+
+@pytest.mark.skipif(not reset_peak_rss(), reason="the peak rss cannot be reset")
+def test_peak_rss_per_block():
+    """
+    Every block reports its own peak, and enclosing blocks keep the peaks of the blocks nested in them.
+    """
+    with measure("run") as run:
+        with measure("large") as large:
+            allocate(400)
+        with measure("small") as small:
+            with measure("day") as day:
+                allocate(50)
+            allocate(100)
+    assert large["peak_rss_mb"] - small["peak_rss_mb"] > 250
+    assert small["peak_rss_mb"] - day["peak_rss_mb"] > 25
+    assert run["peak_rss_mb"] >= large["peak_rss_mb"]
@@ -0,0 +1,59 @@
+import os
+import pandas as pd
+import pytest
+from sleeppy.sleep import SleepPy
+from sleeppy.synthetic import synthetic_recording, write_bin
+
+pytest.importorskip("pyarrow")
+
+FS = 25
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("recording") / "synthetic.bin")
+    write_bin(path, synthetic_recording(2.5, FS), FS)
+    return path
+
+
+def run(recording, results_directory, **kwargs):
+    os.makedirs(results_directory, exist_ok=True)
+    return SleepPy(recording, results_directory, FS, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def reference(recording, tmp_path_factory):
+    return run(recording, str(tmp_path_factory.mktemp("memory")), storage="memory").endpoints
+
+
+@pytest.mark.parametrize("storage", ["arrow", "parquet"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pipeline(recording, reference, tmp_path, storage, workers):
+    """
+    The whole pipeline runs on the columnar stores, whose frames are read-only, and gives the endpoints of an in-memory
+    run.
+    """
+    sleeppy = run(recording, str(tmp_path), storage=storage, workers=workers)
+    results = str(tmp_path) + "/synthetic/results/"
+    assert os.path.exists(results + "Summary_Report.pdf")
+    pd.testing.assert_frame_equal(
+        pd.read_csv(results + "sleep_endpoints_summary.csv", index_col="day"),
+        pd.read_csv(str(tmp_path) + "/synthetic/sleep_endpoints/sleep_endpoints_summary.csv", index_col="day"),
+    )
+    pd.testing.assert_frame_equal(sleeppy.endpoints, reference)
+
+
+@pytest.mark.parametrize("storage", ["arrow", "parquet"])
+def test_pipeline_all_rest(recording, tmp_path, storage):
+    """
+    Masking the rest periods of a day that is rest throughout changes nothing, so the reports get the stored frame
+    itself, which must not be written to.
+    """
+    run(
+        recording,
+        str(tmp_path),
+        storage=storage,
+        minimum_rest_threshold=1e6,
+        maximum_rest_threshold=1e6,
+    )
+    assert os.path.exists(str(tmp_path) + "/synthetic/results/Summary_Report.pdf")